@@ -2,36 +2,158 @@ import cccatalog.api.models as models
 import logging as log
 import json
 import pprint
+import base64
+import re
+import binascii
+import threading
+import time
 from aws_requests_auth.aws_auth import AWSRequestsAuth
-from elasticsearch import Elasticsearch, RequestsHttpConnection
-from elasticsearch.exceptions import NotFoundError, RequestError
+from elasticsearch import Elasticsearch
+from requests.adapters import HTTPAdapter
+from elasticsearch.exceptions import NotFoundError, RequestError, \
+    TransportError
 from elasticsearch_dsl import Q, Search, connections
 from elasticsearch_dsl.response import Response, Hit
 from elasticsearch_dsl.query import Query
 from cccatalog import settings
 from django.core.cache import cache
+from django.db import connection
 from rest_framework import serializers
 from cccatalog.api.utils.validate_images import validate_images
-from cccatalog.api.utils.dead_link_mask import get_query_mask, get_query_hash
-from itertools import accumulate
+from cccatalog.api.utils.dead_link_mask import get_query_mask, \
+    get_query_hash, get_dead_link_ratios, ALL_SOURCES, DeadLinkMask
+from cccatalog.api.utils import search_cache, singleflight, query_cost
+from cccatalog.api.utils.query_fingerprint import get_query_fingerprint
+from cccatalog.api.utils.timing import stage
+from cccatalog.api.utils.circuit_breaker import breaker, BreakerConnection, \
+    HIGH, LOW
+from cccatalog.api.utils.hedging import hedged
+from cccatalog.api.licenses import LICENSE_GROUPS
 from typing import Tuple, List, Optional
 from math import ceil
+from functools import lru_cache
 
 ELASTICSEARCH_MAX_RESULT_WINDOW = 10000
+# Only about this many results of a ranked search can be paged through.
+MAX_PAGINATED_RESULTS = 5000
+# Pages after this one are shed first when Elasticsearch is under pressure.
+SHED_PAGE_DEPTH = 5
+# Exact result counts only change when the index does.
+EXACT_COUNT_CACHE_TIMEOUT = 60 * 20
+# Source counts are recomputed once they are this old (in seconds)...
 SOURCE_CACHE_TIMEOUT = 60 * 20
+# ...but served for up to a day if they can't be.
+SOURCE_CACHE_MAX_AGE = 60 * 60 * 24
+SOURCE_CACHE_PREFIX = 'sources-'
+SOURCE_REFRESH_LOCK_TTL = 30
+# How long a worker with nothing to serve waits for another worker to finish
+# computing the source counts.
+SOURCE_LOCK_WAIT = 5
 FILTER_CACHE_TIMEOUT = 30
+# Image UUIDs never move to another document, so their document IDs can be
+# cached for a long time.
+DOCUMENT_ID_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+DOCUMENT_ID_LRU_SIZE = 10000
+# Precomputed related images only change when the index is rebuilt.
+RELATED_CACHE_TIMEOUT = 60 * 60
+# Assumed fraction of dead links before any have been measured
 DEAD_LINK_RATIO = 1 / 2
+# Added to measured dead link ratios to make a second fetch unlikely
+DEAD_LINK_RATIO_MARGIN = 0.05
+# Never over-fetch by more than 1 / (1 - MAX_DEAD_LINK_RATIO), i.e. 4x
+MAX_DEAD_LINK_RATIO = 3 / 4
 THUMBNAIL = 'thumbnail'
 URL = 'url'
 PROVIDER = 'provider'
 DEEP_PAGINATION_ERROR = 'Deep pagination is not allowed.'
 QUERY_SPECIAL_CHARACTER_ERROR = 'Unescaped special characters are not allowed.'
+CURSOR_ERROR = 'Invalid or expired cursor.'
+# Passed as the cursor to start walking results with cursors
+START_CURSOR = 'start'
+QUERY_COST_ERROR = 'Query is too expensive. Use fewer wildcards, fuzzy ' \
+    'terms and phrases.'
+# Ranking modes. Rank features are either scored for every match as part of
+# the query, or only for the top hits of each shard in a rescore phase.
+QUERY_RANKING = 'query'
+RESCORE_RANKING = 'rescore'
+# Term filters. Each tuple pairs a filter's parameter name in the API with its
+# corresponding field in Elasticsearch. "None" means that the names are
+# identical.
+FILTERS = [
+    ('extension', None),
+    ('categories', None),
+    ('aspect_ratio', None),
+    ('size', None),
+    ('source', None),
+    ('license', 'license__keyword'),
+    ('license_type', 'license__keyword')
+]
+# Each facet of the search results, the keyword field its values are counted
+# in, and the filters that select those values.
+FACETS = {
+    'license': ('license.keyword', {'license', 'license_type'}),
+    'source': ('source.keyword', {'source'}),
+    'extension': ('extension.keyword', {'extension'}),
+    'categories': ('categories.keyword', {'categories'}),
+    'aspect_ratio': ('aspect_ratio.keyword', {'aspect_ratio'}),
+    'size': ('size.keyword', {'size'})
+}
+# The most values counted for each facet
+FACET_SIZE = 100
+FACET_CACHE_TIMEOUT = 60 * 10
+# Fields indexed with `index_prefixes` (see the ingestion server's
+# `es_mapping`). Prefix queries on them are a single term lookup instead of an
+# expansion over the field's whole term dictionary.
+PREFIX_INDEXED_FIELDS = {'title', 'tags.name'}
+# A query made only of bare words, some of which end in a wildcard.
+BARE_TERMS = re.compile(r'^\s*\w+\*?(\s+\w+\*?)*\s*$')
 
 
 class RankFeature(Query):
     name = 'rank_feature'
 
 
+def _get_overfetch_factor(dead_link_ratio: float) -> float:
+    """
+    How many results to fetch per result we expect to keep after dead links
+    have been filtered out.
+    """
+    ratio = min(dead_link_ratio + DEAD_LINK_RATIO_MARGIN, MAX_DEAD_LINK_RATIO)
+    return 1 / (1 - ratio)
+
+
+def _estimate_dead_link_ratio(query_mask: Optional[DeadLinkMask]) -> float:
+    """
+    Estimate the fraction of dead links in the results of a query, preferring
+    what has been measured for this query over what has been measured across
+    all sources.
+    """
+    if query_mask:
+        return 1 - query_mask.alive / len(query_mask)
+    measured = get_dead_link_ratios([])[ALL_SOURCES]
+    return measured if measured is not None else DEAD_LINK_RATIO
+
+
+def _estimate_batch_dead_link_ratio(fetched: List[Hit], kept: int) -> float:
+    """
+    Estimate the fraction of dead links past the end of a batch of results,
+    from the dead links in the batch itself and the dead link ratios measured
+    for the sources the batch hit.
+    """
+    observed = 1 - kept / len(fetched)
+    source_ratios = get_dead_link_ratios(
+        [getattr(hit, 'source', 'unknown') for hit in fetched]
+    )
+    weighted = []
+    for hit in fetched:
+        ratio = source_ratios.get(getattr(hit, 'source', 'unknown'))
+        if ratio is not None:
+            weighted.append(ratio)
+    if not weighted:
+        return observed
+    return max(observed, sum(weighted) / len(weighted))
+
+
 def _paginate_with_dead_link_mask(s: Search, page_size: int,
                                   page: int) -> Tuple[int, int]:
     """
@@ -43,35 +165,47 @@ def _paginate_with_dead_link_mask(s: Search, page_size: int,
     :param page: The page number.
     :return: Tuple of start and end.
     """
-    query_hash = get_query_hash(s)
-    query_mask = get_query_mask(query_hash)
+    with stage('fingerprint'):
+        query_hash = get_query_hash(s)
+    with stage('mask'):
+        query_mask = get_query_mask(query_hash)
+    overfetch = _get_overfetch_factor(_estimate_dead_link_ratio(query_mask))
     if not query_mask:
         start = 0
-        end = ceil(page_size * page / (1 - DEAD_LINK_RATIO))
-    elif page_size * (page - 1) > sum(query_mask):
+        end = ceil(page_size * page * overfetch)
+    elif page_size * (page - 1) > query_mask.alive:
         start = len(query_mask)
-        end = ceil(page_size * page / (1 - DEAD_LINK_RATIO))
+        end = ceil(page_size * page * overfetch)
     else:
-        accu_query_mask = list(accumulate(query_mask))
         start = 0
         if page > 1:
             try:
-                start = accu_query_mask.index(page_size * (page - 1) + 1)
+                start = query_mask.select(page_size * (page - 1) + 1)
             except ValueError:
-                start = accu_query_mask.index(page_size * (page - 1)) + 1
-        if page_size * page > sum(query_mask):
-            end = ceil(page_size * page / (1 - DEAD_LINK_RATIO))
+                start = query_mask.select(page_size * (page - 1)) + 1
+        if page_size * page > query_mask.alive:
+            end = ceil(page_size * page * overfetch)
         else:
-            end = accu_query_mask.index(page_size * page) + 1
+            end = query_mask.select(page_size * page) + 1
     return start, end
 
 
 def _get_query_slice(s: Search, page_size: int, page: int,
-                     filter_dead: Optional[bool] = False) -> Tuple[int, int]:
+                     filter_dead: Optional[bool] = False,
+                     cursor: Optional[bool] = False) -> Tuple[int, int]:
     """
     Select the start and end of the search results for this query.
     """
-    if filter_dead:
+    if cursor:
+        # `search_after` resumes where the previous page left off, so the
+        # slice always starts at the top of the remaining results.
+        start_slice = 0
+        if filter_dead:
+            overfetch = _get_overfetch_factor(_estimate_dead_link_ratio(None))
+            end_slice = ceil(page_size * overfetch)
+        else:
+            end_slice = page_size
+    elif filter_dead:
         start_slice, end_slice = \
             _paginate_with_dead_link_mask(s, page_size, page)
     else:
@@ -83,6 +217,68 @@ def _get_query_slice(s: Search, page_size: int, page: int,
     return start_slice, end_slice
 
 
+def _split_prefix_terms(query_string):
+    """
+    Split a query made only of bare words into plain words and prefixes.
+
+    :return: The plain words and the prefixes (without the wildcard), or None
+    if the query contains no prefixes or uses any other query syntax.
+    """
+    if '*' not in query_string or not BARE_TERMS.match(query_string):
+        return None
+    terms = query_string.split()
+    plain = [t for t in terms if not t.endswith('*')]
+    prefixes = [t[:-1].lower() for t in terms if t.endswith('*')]
+    return plain, prefixes
+
+
+def _text_query(query_string, fields, default_operator='OR', **kwargs) -> Q:
+    """
+    Build a `simple_query_string` query, rewriting trailing wildcards in
+    queries made of bare words as `prefix` queries on the fields that have a
+    prefix index. Other fields, such as `description`, still expand the
+    wildcard in a `simple_query_string`.
+
+    :param query_string: The escaped user query.
+    :param fields: The fields to search.
+    :param default_operator: Whether all ('AND') or any ('OR') of the terms
+    must match.
+    :param kwargs: Other query parameters, such as `_name` or `boost`.
+    """
+    split = _split_prefix_terms(query_string)
+    prefix_fields = [f for f in fields if f in PREFIX_INDEXED_FIELDS]
+    if split is None or not prefix_fields:
+        return Q(
+            'simple_query_string',
+            query=query_string,
+            fields=fields,
+            default_operator=default_operator,
+            **kwargs
+        )
+    plain, prefixes = split
+    other_fields = [f for f in fields if f not in PREFIX_INDEXED_FIELDS]
+    clauses = []
+    if plain:
+        clauses.append(Q(
+            'simple_query_string',
+            query=' '.join(plain),
+            fields=fields,
+            default_operator=default_operator
+        ))
+    for prefix in prefixes:
+        matches = [Q('prefix', **{f: prefix}) for f in prefix_fields]
+        if other_fields:
+            matches.append(Q(
+                'simple_query_string',
+                query=prefix + '*',
+                fields=other_fields
+            ))
+        clauses.append(Q('bool', should=matches))
+    if default_operator == 'AND':
+        return Q('bool', must=clauses, **kwargs)
+    return Q('bool', should=clauses, minimum_should_match=1, **kwargs)
+
+
 def _quote_escape(query_string):
     """
     If there are any unmatched quotes in the query supplied by the user, ignore
@@ -95,13 +291,146 @@ def _quote_escape(query_string):
         return query_string
 
 
+def _record_cost_decision(query_string, param_name, cost, decision, limited):
+    try:
+        query_cost.count_decision(decision)
+    except Exception:
+        log.warning('Failed to count query cost decision', exc_info=True)
+    if decision != query_cost.ACCEPTED:
+        log.info(
+            f'query_cost param={param_name} cost={cost} '
+            f'budget={settings.QUERY_COST_BUDGET} decision={decision} '
+            f'query={json.dumps(query_string)} rewritten={json.dumps(limited)}'
+        )
+
+
+def _limit_query_cost(query_string, param_name, fields, record=True):
+    """
+    Estimate the cost of a query and, if it exceeds QUERY_COST_BUDGET, either
+    rewrite it to a cheaper form or reject it, depending on
+    QUERY_COST_ACTION. Every decision is logged and counted.
+
+    :param query_string: The escaped user query.
+    :param param_name: The query parameter the query came from.
+    :param fields: The fields the query searches.
+    :param record: Whether to log and count the decision. Companion queries
+    of a search that has already been built, such as exact counts, make the
+    same decision and don't record it again.
+    :return: The query to run.
+    """
+    # Prefixes are only cheap if no field has to expand them.
+    prefix_indexed = _split_prefix_terms(query_string) is not None and \
+        all(f in PREFIX_INDEXED_FIELDS for f in fields)
+    limited, cost, decision = query_cost.limit_cost(
+        query_string, settings.QUERY_COST_BUDGET, prefix_indexed
+    )
+    if decision == query_cost.REWRITTEN and \
+            settings.QUERY_COST_ACTION == 'reject':
+        decision = query_cost.REJECTED
+    if record:
+        _record_cost_decision(query_string, param_name, cost, decision, limited)
+    if decision == query_cost.ACCEPTED:
+        return query_string
+    if decision == query_cost.REJECTED:
+        raise ValueError(QUERY_COST_ERROR)
+    return limited
+
+
+def encode_cursor(sort_values: list, pit_id: Optional[str] = None) -> str:
+    """
+    Serialize the sort values of the last result on a page (and optionally a
+    point in time ID) into an opaque cursor that can be handed to clients.
+    """
+    payload = {'search_after': sort_values}
+    if pit_id:
+        payload['pit_id'] = pit_id
+    serialized = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(serialized.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Recover the `search_after` sort values and point in time ID from a cursor
+    produced by `encode_cursor`.
+
+    :raises ValueError: If the cursor is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError(CURSOR_ERROR)
+    if not isinstance(payload, dict) or \
+            not isinstance(payload.get('search_after'), list):
+        raise ValueError(CURSOR_ERROR)
+    return payload
+
+
+def _open_point_in_time(index: str, preference: str) -> Optional[str]:
+    """
+    Open a point in time against the index so that every page of a cursor walk
+    sees the same snapshot of the data. Requires Elasticsearch 7.10 or later;
+    returns None if the cluster does not support it (older clusters answer
+    405) or fails to open one.
+    """
+    try:
+        response = es.transport.perform_request(
+            'POST',
+            f'/{index}/_pit',
+            params={
+                'keep_alive': settings.POINT_IN_TIME_KEEP_ALIVE,
+                'preference': preference
+            }
+        )
+        return response['id']
+    except TransportError:
+        log.warning('Failed to open point in time', exc_info=True)
+        return None
+
+
+def _close_point_in_time(pit_id: str):
+    """
+    Close a point in time once a cursor walk has reached the end, instead of
+    holding its search context open until it expires.
+    """
+    try:
+        es.transport.perform_request('DELETE', '/_pit', body={'id': pit_id})
+    except TransportError:
+        log.warning('Failed to close point in time', exc_info=True)
+
+
+def _starts_point_in_time(cursor) -> bool:
+    """
+    Whether a search starts a cursor walk in a point in time of its own,
+    which can't be shared with other searches through the search cache.
+    """
+    return settings.USE_POINT_IN_TIME and cursor == START_CURSOR
+
+
+def _get_next_cursor(resume_after: Optional[Hit],
+                     pit_id: Optional[str]) -> Optional[str]:
+    """
+    Build the cursor pointing at the page after a hit, as returned by
+    `_post_process_results`. There is no next page if there is no such hit.
+    """
+    if resume_after is None or not getattr(resume_after.meta, 'sort', None):
+        return None
+    return encode_cursor(list(resume_after.meta.sort), pit_id)
+
+
 def _post_process_results(s, start, end, page_size, search_results,
-                          request, filter_dead) -> List[Hit]:
+                          request, filter_dead,
+                          use_dead_link_mask=True,
+                          defer_validation=False,
+                          pit_id=None) -> Tuple[List[Hit], Optional[Hit]]:
     """
     After fetching the search results from the back end, iterate through the
     results, perform image validation, and route certain thumbnails through our
     proxy.
 
+    If too many dead links are filtered out to fill the page, the results are
+    topped up with at most one more fetch, sized by the dead link ratio of
+    the batch and of the sources it hit.
+
     :param s: The Elasticsearch Search object.
     :param start: The start of the result slice.
     :param end: The end of the result slice.
@@ -110,67 +439,142 @@ def _post_process_results(s, start, end, page_size, search_results,
     :param request: The Django request object, used to build a "reversed" URL
     to detail pages.
     :param filter_dead: Whether images should be validated.
-    :return: List of results.
+    :param use_dead_link_mask: Whether to record validated links in the
+    query's dead link mask. Cursor-paginated results are not positional, so
+    they are validated without a mask.
+    :param defer_validation: Whether to validate links that aren't cached yet
+    in the background instead of right away.
+    :param pit_id: The point in time the search was executed in, if any.
+    :return: List of results, and the hit the next page resumes after, or
+    None if Elasticsearch has no more hits. That is the last result of a full
+    page, or the last hit fetched if dead links cut the page short.
+    """
+    results, to_validate = _process_hits(search_results)
+    fetched = list(results)
+    # A short batch means that there are no more results to fetch.
+    exhausted = len(fetched) < end - start
+    if not filter_dead:
+        return _page_and_resume_point(results, page_size, fetched, exhausted)
+
+    with stage('fingerprint'):
+        query_hash = get_query_hash(s) if use_dead_link_mask else None
+    with stage('validate_links'):
+        validate_images(
+            query_hash, start, results, to_validate, defer=defer_validation
+        )
+    if len(results) >= page_size or exhausted:
+        return _page_and_resume_point(results, page_size, fetched, exhausted)
+
+    dead_link_ratio = _estimate_batch_dead_link_ratio(fetched, len(results))
+    missing = page_size - len(results)
+    extra = ceil(missing * _get_overfetch_factor(dead_link_ratio))
+    # A short page is better than adding load to a struggling cluster.
+    if start + end + extra > ELASTICSEARCH_MAX_RESULT_WINDOW or \
+            breaker.should_shed():
+        return _page_and_resume_point(results, page_size, fetched, False)
+    if use_dead_link_mask:
+        s = s[end:end + extra]
+    else:
+        s = s.extra(search_after=list(fetched[-1].meta.sort))[0:extra]
+    with stage('requery'):
+        extra_response = _execute_with_point_in_time(s, pit_id)
+    extra_results, extra_to_validate = _process_hits(extra_response)
+    extra_fetched = list(extra_results)
+    with stage('validate_links'):
+        validate_images(
+            query_hash, end, extra_results, extra_to_validate,
+            defer=defer_validation
+        )
+    results += extra_results
+    return _page_and_resume_point(
+        results, page_size, fetched + extra_fetched,
+        len(extra_fetched) < extra
+    )
+
+
+def _page_and_resume_point(results, page_size, fetched,
+                           exhausted) -> Tuple[List[Hit], Optional[Hit]]:
+    """
+    Cut the results down to a page and find the hit the next page resumes
+    after. See `_post_process_results`.
+
+    :param fetched: Every hit fetched from Elasticsearch, dead or alive.
+    :param exhausted: Whether the last fetch returned fewer hits than were
+    requested.
+    """
+    if len(results) >= page_size:
+        return results[:page_size], results[page_size - 1]
+    if exhausted or not fetched:
+        return results, None
+    return results, fetched[-1]
+
+
+def _process_hits(search_results) -> Tuple[List[Hit], List[str]]:
+    """
+    Record which fields matched each hit and collect the image URLs that need
+    to be validated.
     """
     results = []
     to_validate = []
     for res in search_results:
+        if hasattr(res.meta, 'matched_queries'):
+            res.fields_matched = list(res.meta.matched_queries)
         if hasattr(res.meta, 'highlight'):
-            res.fields_matched = dir(res.meta.highlight)
+            res.highlight = res.meta.highlight.to_dict()
         to_validate.append(res.url)
         results.append(res)
+    return results, to_validate
 
-    if filter_dead:
-        query_hash = get_query_hash(s)
-        validate_images(query_hash, start, results, to_validate)
-
-        if len(results) < page_size:
-            end += int(end / 2)
-            if start + end > ELASTICSEARCH_MAX_RESULT_WINDOW:
-                return results
-
-            s = s[start:end]
-            search_response = s.execute()
-
-            return _post_process_results(
-                s,
-                start,
-                end,
-                page_size,
-                search_response,
-                request,
-                filter_dead
-            )
-    return results[:page_size]
 
+@lru_cache()
+def _get_result_source_fields() -> List[str]:
+    """
+    The only document fields fetched for search results and recommendations:
+    those `ImageSerializer` reads from a hit, plus the fields link validation
+    reads. `fields_matched` and `highlight` come from the hit's metadata.
+    """
+    # Imported here because the serializers import this module.
+    from cccatalog.api.serializers.image_serializers import ImageSerializer
+    return sorted(set(ImageSerializer.document_fields()) | {'url', 'source'})
 
-def _apply_filter(s: Search, search_params, param_name, renamed_param=None):
+
+def _get_filter(search_params, param_name, renamed_param=None) -> Optional[Q]:
     """
-    Parse and apply a filter from the search parameters serializer. The
-    parameter key is assumed to have the same name as the corresponding
-    Elasticsearch property. Each parameter value is assumed to be a comma
-    separated list encoded as a string.
+    Parse a filter from the search parameters serializer. The parameter key
+    is assumed to have the same name as the corresponding Elasticsearch
+    property. Each parameter value is assumed to be a comma separated list
+    encoded as a string.
 
-    :param s: The Search object to apply the filter to.
     :param search_params: A serializer containing user input.
     :param param_name: The name of the parameter in search_params.
     :param renamed_param: In some cases, the param name in the backend is not
     the same as the param we want to expose to the outside world. Use this to
     set the corresponding parameter name in Elasticsearch.
+    :return: The filter query, or None if the parameter wasn't given.
+    """
+    if param_name not in search_params.data:
+        return None
+    filters = []
+    for arg in search_params.data[param_name].split(','):
+        _param = renamed_param if renamed_param else param_name
+        args = {
+            'name_or_query': 'term',
+            _param: arg
+        }
+        filters.append(Q(**args))
+    return Q('bool', should=filters)
+
+
+def _apply_filter(s: Search, search_params, param_name, renamed_param=None):
+    """
+    Parse and apply a filter from the search parameters serializer. See
+    `_get_filter`.
+
+    :param s: The Search object to apply the filter to.
     :return: A Search object with the filter applied.
     """
-    if param_name in search_params.data:
-        filters = []
-        for arg in search_params.data[param_name].split(','):
-            _param = renamed_param if renamed_param else param_name
-            args = {
-                'name_or_query': 'term',
-                _param: arg
-            }
-            filters.append(Q(**args))
-        return s.filter('bool', should=filters)
-    else:
-        return s
+    query = _get_filter(search_params, param_name, renamed_param)
+    return s.filter(query) if query else s
 
 
 def _exclude_filtered(s: Search):
@@ -199,41 +603,262 @@ def _exclude_mature_by_param(s: Search, search_params):
     return s
 
 
+def _get_search_cache_key(s: Search, index, page_size, filter_dead,
+                          page, cursor, defer_validation) -> str:
+    """
+    Key a search by its query fingerprint and everything else that
+    influences its results.
+    """
+    return get_query_fingerprint(
+        s,
+        index=index,
+        page_size=page_size,
+        filter_dead=filter_dead,
+        page=page if not cursor else None,
+        cursor=cursor,
+        defer_validation=defer_validation
+    )
+
+
+def _to_cacheable(search_result):
+    """
+    Hits hold references to the originating search, so only their documents
+    and sort values are cached.
+    """
+    results, page_count, result_count, next_cursor, exact = search_result
+    hits = [
+        {'_source': r.to_dict(), 'sort': list(getattr(r.meta, 'sort', []))}
+        for r in results
+    ]
+    return hits, page_count, result_count, next_cursor, exact
+
+
+def _from_cacheable(cached):
+    hits, page_count, result_count, next_cursor, exact = cached
+    return [Hit(h) for h in hits], page_count, result_count, next_cursor, \
+        exact
+
+
+def _refresh_cached_search(cache_key, *args, **kwargs):
+    """
+    Recompute a stale search in the background and replace the cached entry.
+    """
+    try:
+        search_cache.cache_search(
+            cache_key, _to_cacheable(_search(*args, **kwargs))
+        )
+    except Exception:
+        log.warning('Failed to refresh cached search', exc_info=True)
+    finally:
+        search_cache.release_refresh_lock(cache_key)
+        connection.close()
+
+
+def _get_cached_search(cache_key, s, *args, **kwargs):
+    """
+    Look up a search in the search cache. If the cached entry is stale, a
+    single worker refreshes it in the background. See `_search` for
+    parameters.
+
+    :return: The cached search result, or None on a miss.
+    """
+    cached, fresh = search_cache.get_cached_search(cache_key)
+    if cached is None:
+        return None
+    if not fresh and search_cache.acquire_refresh_lock(cache_key):
+        threading.Thread(
+            target=_refresh_cached_search,
+            args=(cache_key, s) + args,
+            kwargs=kwargs,
+            daemon=True
+        ).start()
+    return _from_cacheable(cached)
+
+
 def search(search_params, index, page_size, ip, request,
-           filter_dead, page=1) -> Tuple[List[Hit], int, int]:
+           filter_dead, page=1, cursor=None,
+           defer_validation=False) -> Tuple[List[Hit], int, int,
+                                            Optional[str], bool]:
     """
     Given a set of keywords and an optional set of filters, perform a ranked
-    paginated search.
+    paginated search. Popular searches are served from the search cache;
+    stale entries are served immediately while a single worker refreshes them
+    in the background. Identical searches that miss the cache at the same time
+    are only executed once.
 
     :param search_params: Search parameters. See
      :class: `ImageSearchQueryStringSerializer`.
     :param index: The Elasticsearch index to search (e.g. 'image')
     :param page_size: The number of results to return per page.
-    :param ip: The user's hashed IP. Hashed IPs are used to anonymously but
-    uniquely identify users exclusively for ensuring query consistency across
-    Elasticsearch shards.
+    :param ip: The user's search preference, which routes the search to the
+    same shard copies as the user's previous searches. See
+    `cccatalog.api.utils.preference`.
     :param request: Django's request object.
     :param filter_dead: Whether dead links should be removed.
     :param page: The results page number.
+    :param cursor: An opaque cursor returned by a previous search, or
+    START_CURSOR to start walking results with cursors from the first page.
+    When given, results resume after the last hit of the previous page via
+    `search_after` and `page` is ignored.
+    :param defer_validation: Whether links that haven't been validated yet
+    should be validated in the background instead of during the request.
     :return: Tuple with a List of Hits from elasticsearch, the total count of
-    pages, and number of results.
+    pages, number of results, a cursor pointing at the next page, and whether
+    the number of results is exact rather than a lower bound.
+    """
+    with stage('build_query'):
+        s = _build_query(search_params, index)
+    with stage('fingerprint'):
+        cache_key = _get_search_cache_key(
+            s, index, page_size, filter_dead, page, cursor, defer_validation
+        )
+    shared = not _starts_point_in_time(cursor)
+    if settings.USE_SEARCH_CACHE and shared:
+        with stage('cache'):
+            cached = _get_cached_search(
+                cache_key, s, index, page_size, ip, request, filter_dead,
+                page=page, cursor=cursor, defer_validation=defer_validation
+            )
+        if cached is not None:
+            return cached
+
+    def execute():
+        search_result = _search(
+            s, index, page_size, ip, request, filter_dead,
+            page=page, cursor=cursor, defer_validation=defer_validation
+        )
+        if settings.USE_SEARCH_CACHE and shared:
+            search_cache.cache_search(cache_key, _to_cacheable(search_result))
+        return search_result
+
+    if not settings.USE_SINGLEFLIGHT or not shared:
+        return execute()
+    # Identical searches arriving at the same time share a single execution.
+    return singleflight.do(
+        cache_key, execute, encode=_to_cacheable, decode=_from_cacheable
+    )
+
+
+def batch_search(searches: List[dict], ip,
+                 request) -> List[Tuple[List[Hit], int, int,
+                                        Optional[str], bool]]:
+    """
+    Perform several searches at once. Searches that can't be served from the
+    search cache are sent to Elasticsearch together in a single `_msearch`
+    request.
+
+    :param searches: One dictionary per search, holding the `search_params`,
+    `index`, `page_size`, `filter_dead`, `page`, `cursor` and
+    `defer_validation` arguments of `search`.
+    :param ip: The user's search preference. See `search`.
+    :param request: Django's request object.
+    :return: The result of each search, in order. See `search`.
+    """
+    results = [None] * len(searches)
+    pending = []
+    for idx, params in enumerate(searches):
+        index, page_size = params['index'], params['page_size']
+        filter_dead = params['filter_dead']
+        kwargs = {
+            'page': params.get('page', 1),
+            'cursor': params.get('cursor'),
+            'defer_validation': params.get('defer_validation', False)
+        }
+        with stage('build_query'):
+            s = _build_query(params['search_params'], index)
+        cache_key = None
+        if settings.USE_SEARCH_CACHE and \
+                not _starts_point_in_time(kwargs['cursor']):
+            with stage('fingerprint'):
+                cache_key = _get_search_cache_key(
+                    s, index, page_size, filter_dead, kwargs['page'],
+                    kwargs['cursor'], kwargs['defer_validation']
+                )
+            with stage('cache'):
+                results[idx] = _get_cached_search(
+                    cache_key, s, index, page_size, ip, request, filter_dead,
+                    **kwargs
+                )
+            if results[idx] is not None:
+                continue
+        prepared = _prepare_search(
+            s, index, page_size, ip, filter_dead,
+            page=kwargs['page'], cursor=kwargs['cursor']
+        )
+        pending.append((idx, params, kwargs, cache_key, prepared))
+
+    # Searches pinned to a point in time can't name an index, so they are
+    # executed on their own.
+    body = []
+    for _, params, _, _, (s, _, _, pit_id) in pending:
+        if not pit_id:
+            body += [
+                {'index': params['index'], 'preference': str(ip)},
+                s.to_dict()
+            ]
+    if pending:
+        priorities = {
+            _get_priority(kwargs['page'], kwargs['cursor'])
+            for _, _, kwargs, _, _ in pending
+        }
+        breaker.admit(LOW if LOW in priorities else HIGH)
+    with stage('es'):
+        responses = iter(
+            es.msearch(body=body, request_timeout=7)['responses']
+            if body else []
+        )
+    for idx, params, kwargs, cache_key, prepared in pending:
+        s, start, end, pit_id = prepared
+        try:
+            if pit_id:
+                with stage('es'):
+                    search_response = _execute_with_point_in_time(s, pit_id)
+                pit_id = getattr(search_response, 'pit_id', None)
+            else:
+                raw = next(responses)
+                if 'error' in raw:
+                    raise RequestError(
+                        raw.get('status', 400),
+                        raw['error'].get('type'),
+                        {'error': raw['error']}
+                    )
+                search_response = Response(s, raw)
+        except RequestError as e:
+            raise ValueError(e)
+        results[idx] = _complete_search(
+            s, start, end, params['page_size'], search_response, request,
+            params['filter_dead'], cursor=kwargs['cursor'],
+            defer_validation=kwargs['defer_validation'], pit_id=pit_id
+        )
+        if cache_key is not None:
+            search_cache.cache_search(cache_key, _to_cacheable(results[idx]))
+    return results
+
+
+def _build_query(search_params, index, ranking_mode=None,
+                 apply_filters=True, record_cost=True) -> Search:
+    """
+    Build a ranked search for a set of keywords and an optional set of
+    filters. Pagination and routing are left to the caller.
+
+    :param search_params: Search parameters. See
+     :class: `ImageSearchQueryStringSerializer`.
+    :param index: The Elasticsearch index to search (e.g. 'image')
+    :param ranking_mode: How results are boosted by popularity and
+    authority, either QUERY_RANKING or RESCORE_RANKING. Defaults to the
+    RANKING_MODE setting.
+    :param apply_filters: Whether to apply the term FILTERS. Mature content
+    and disabled sources are always excluded.
+    :param record_cost: Whether to log and count query cost decisions. Off
+    for companion queries of a search that has already been built.
+    :return: The Search object.
     """
     s = Search(index=index)
-    # Apply term filters. Each tuple pairs a filter's parameter name in the API
-    # with its corresponding field in Elasticsearch. "None" means that the
-    # names are identical.
-    filters = [
-        ('extension', None),
-        ('categories', None),
-        ('aspect_ratio', None),
-        ('size', None),
-        ('source', None),
-        ('license', 'license__keyword'),
-        ('license_type', 'license__keyword')
-    ]
-    for tup in filters:
-        api_field, elasticsearch_field = tup
-        s = _apply_filter(s, search_params, api_field, elasticsearch_field)
+    if apply_filters:
+        for api_field, elasticsearch_field in FILTERS:
+            s = _apply_filter(
+                s, search_params, api_field, elasticsearch_field
+            )
 
     # Exclude mature content and disabled sources
     s = _exclude_mature_by_param(s, search_params)
@@ -243,91 +868,223 @@ def search(search_params, index, page_size, ip, request,
     # individual field-level queries specified.
     search_fields = ['tags.name', 'title', 'description']
     if 'q' in search_params.data:
-        query = _quote_escape(search_params.data['q'])
+        query = _limit_query_cost(
+            _quote_escape(search_params.data['q']), 'q', search_fields,
+            record_cost
+        )
         s = s.query(
-            'simple_query_string',
-            query=query,
-            fields=search_fields,
-            default_operator='AND'
+            _text_query(query, search_fields, default_operator='AND')
         )
-        # Boost exact matches
+        # Boost exact matches in the title. Queries of several words are
+        # matched as a phrase, which the title's shingles answer directly; a
+        # single word only needs a term match.
         quotes_stripped = query.replace('"', '')
-        exact_match_boost = Q(
-            'simple_query_string',
-            fields=['title'],
-            query=f"\"{quotes_stripped}\"",
-            boost=10000
-        )
-        s = Search().query(
+        exact_match_boost = []
+        if len(quotes_stripped.split()) > 1:
+            exact_match_boost.append(Q(
+                'simple_query_string',
+                fields=['title'],
+                query=f"\"{quotes_stripped}\"",
+                boost=10000
+            ))
+        elif quotes_stripped.strip():
+            exact_match_boost.append(Q(
+                'match',
+                title={'query': quotes_stripped, 'boost': 10000}
+            ))
+        # Name an optional, zero-boost query for each field so that
+        # Elasticsearch reports which fields matched each result. Optional
+        # clauses are only evaluated for results of the main query, and
+        # negated terms are left out: a field doesn't match a query just
+        # because it lacks a term.
+        positive_query = query_cost.strip_negations(query)
+        matched_field_queries = [
+            _text_query(positive_query, [field], _name=field, boost=0)
+            for field in search_fields
+        ] if positive_query else []
+        s = Search(index=index).query(
             Q(
                 'bool',
                 must=s.query,
-                should=exact_match_boost
+                should=exact_match_boost + matched_field_queries
             )
         )
     else:
         if 'creator' in search_params.data:
-            creator = _quote_escape(search_params.data['creator'])
-            s = s.query(
-                'simple_query_string', query=creator, fields=['creator']
+            creator = _limit_query_cost(
+                _quote_escape(search_params.data['creator']), 'creator',
+                ['creator'], record_cost
             )
+            s = s.query(_text_query(creator, ['creator'], _name='creator'))
         if 'title' in search_params.data:
-            title = _quote_escape(search_params.data['title'])
-            s = s.query(
-                'simple_query_string', query=title, fields=['title']
+            title = _limit_query_cost(
+                _quote_escape(search_params.data['title']), 'title',
+                ['title'], record_cost
             )
+            s = s.query(_text_query(title, ['title'], _name='title'))
         if 'tags' in search_params.data:
-            tags = _quote_escape(search_params.data['tags'])
-            s = s.query(
-                'simple_query_string',
-                fields=['tags.name'],
-                query=tags
+            tags = _limit_query_cost(
+                _quote_escape(search_params.data['tags']), 'tags',
+                ['tags.name'], record_cost
             )
+            s = s.query(_text_query(tags, ['tags.name'], _name='tags.name'))
 
+    if ranking_mode is None:
+        ranking_mode = settings.RANKING_MODE
+    rescore = settings.USE_RANK_FEATURES and ranking_mode == RESCORE_RANKING
     if settings.USE_RANK_FEATURES:
         feature_boost = {
-            'standardized_popularity': 10000
+            'standardized_popularity': settings.POPULARITY_BOOST,
+            'authority_boost': settings.AUTHORITY_BOOST
         }
         rank_queries = []
         for field, boost in feature_boost.items():
-            rank_queries.append(Q('rank_feature', field=field, boost=boost))
-        s = Search().query(
-            Q(
-                'bool',
-                must=s.query,
-                should=rank_queries
+            if boost:
+                rank_queries.append(
+                    Q('rank_feature', field=field, boost=boost)
+                )
+        if rescore and rank_queries:
+            # Only score the features of the top hits of each shard.
+            s = s.extra(rescore={
+                'window_size': settings.RESCORE_WINDOW_SIZE,
+                'query': {
+                    'rescore_query': Q('bool', should=rank_queries).to_dict(),
+                    'score_mode': 'total'
+                }
+            })
+        else:
+            s = Search(index=index).query(
+                Q(
+                    'bool',
+                    must=s.query,
+                    should=rank_queries
+                )
             )
-        )
 
-    # Use highlighting to determine which fields contribute to the selection of
-    # top results.
-    s = s.highlight(*search_fields)
-    s = s.highlight_options(order='score')
+    # Highlighting is expensive, so it is only done on request.
+    if search_params.data.get('highlight'):
+        s = s.highlight(*search_fields)
+        s = s.highlight_options(order='score')
     s.extra(track_scores=True)
-    # Route users to the same Elasticsearch worker node to reduce
-    # pagination inconsistencies and increase cache hits.
-    s = s.params(preference=str(ip), request_timeout=7)
-    # Paginate
-    start, end = _get_query_slice(s, page_size, page, filter_dead)
-    s = s[start:end]
+    s = s.source(_get_result_source_fields())
+    # Break ties in relevance with the sequential ID so that results have a
+    # total order that `search_after` can resume from. Rescoring can't be
+    # combined with a sort, so rescored searches can't use cursors.
+    if not rescore:
+        s = s.sort('_score', {'id': 'desc'})
+    return s
+
+
+def _get_priority(page, cursor=None) -> str:
+    """
+    Deep pages are shed before other searches when Elasticsearch is under
+    pressure. Cursors don't say how deep they are, and resuming from one is
+    cheap, so they are never considered deep.
+    """
+    if not cursor and page > SHED_PAGE_DEPTH:
+        return LOW
+    return HIGH
+
+
+def cursor_pagination_available() -> bool:
+    """
+    Whether searches are sorted so that they can be paginated with cursors.
+    """
+    rescore = settings.RANKING_MODE == RESCORE_RANKING
+    return not (settings.USE_RANK_FEATURES and rescore)
+
+
+def _search(s: Search, index, page_size, ip, request,
+            filter_dead, page=1, cursor=None,
+            defer_validation=False) -> Tuple[List[Hit], int, int,
+                                             Optional[str], bool]:
+    """
+    Paginate and execute a search built by `_build_query`, then validate and
+    post-process the results. See `search` for parameters.
+    """
+    s, start, end, pit_id = _prepare_search(
+        s, index, page_size, ip, filter_dead, page=page, cursor=cursor
+    )
+    breaker.admit(_get_priority(page, cursor))
     try:
         if settings.VERBOSE_ES_RESPONSE:
             log.info(pprint.pprint(s.to_dict()))
-        search_response = s.execute()
-        log.info(f'query={json.dumps(s.to_dict())},'
-                 f' es_took_ms={search_response.took}')
+        with stage('es'):
+            if pit_id:
+                search_response = _execute_with_point_in_time(s, pit_id)
+            else:
+                search_response = hedged(
+                    lambda preference: s.params(
+                        preference=preference
+                    ).execute(),
+                    str(ip)
+                )
+        pit_id = getattr(search_response, 'pit_id', None)
         if settings.VERBOSE_ES_RESPONSE:
             log.info(pprint.pprint(search_response.to_dict()))
     except RequestError as e:
         raise ValueError(e)
-    results = _post_process_results(
+    return _complete_search(
+        s, start, end, page_size, search_response, request, filter_dead,
+        cursor=cursor, defer_validation=defer_validation, pit_id=pit_id
+    )
+
+
+def _prepare_search(s: Search, index, page_size, ip, filter_dead, page=1,
+                    cursor=None) -> Tuple[Search, int, int, Optional[str]]:
+    """
+    Route and paginate a search built by `_build_query`.
+
+    :return: The paginated search, the start and end of its slice, and the
+    point in time to execute it in, if any.
+    """
+    # Route users to the same Elasticsearch worker node to reduce
+    # pagination inconsistencies and increase cache hits.
+    s = s.params(preference=str(ip), request_timeout=7)
+    # Count hits only as far as they can be paginated.
+    s = s.extra(
+        track_total_hits=_get_last_allowed_page(page_size) * page_size
+    )
+    pit_id = None
+    if cursor == START_CURSOR:
+        # The first page of a walk is pinned to the same snapshot as the
+        # pages that follow it.
+        if settings.USE_POINT_IN_TIME:
+            pit_id = _open_point_in_time(index, str(ip))
+    elif cursor:
+        decoded_cursor = decode_cursor(cursor)
+        s = s.extra(search_after=decoded_cursor['search_after'])
+        pit_id = decoded_cursor.get('pit_id')
+    # Paginate
+    start, end = _get_query_slice(
+        s, page_size, page, filter_dead, cursor=bool(cursor)
+    )
+    return s[start:end], start, end, pit_id
+
+
+def _complete_search(s: Search, start, end, page_size, search_response,
+                     request, filter_dead, cursor=None,
+                     defer_validation=False,
+                     pit_id=None) -> Tuple[List[Hit], int, int,
+                                           Optional[str], bool]:
+    """
+    Validate and post-process the response to a search prepared by
+    `_prepare_search`.
+    """
+    log.info(f'query={json.dumps(s.to_dict())},'
+             f' query_fingerprint={get_query_fingerprint(s)},'
+             f' es_took_ms={search_response.took}')
+    results, resume_after = _post_process_results(
         s,
         start,
         end,
         page_size,
         search_response,
         request,
-        filter_dead
+        filter_dead,
+        use_dead_link_mask=not cursor,
+        defer_validation=defer_validation,
+        pit_id=pit_id
     )
 
     result_count, page_count = _get_result_and_page_count(
@@ -335,41 +1092,140 @@ def search(search_params, index, page_size, ip, request,
         results,
         page_size
     )
-    return results, page_count, result_count
+    exact = search_response.hits.total.relation == 'eq'
+    next_cursor = _get_next_cursor(resume_after, pit_id)
+    if pit_id and next_cursor is None:
+        _close_point_in_time(pit_id)
+    return results, page_count, result_count, next_cursor, exact
 
 
-def related_images(uuid, index, request, filter_dead):
+def _execute_with_point_in_time(s: Search, pit_id: Optional[str]) -> Response:
     """
-    Given a UUID, find related search results.
+    Execute a search, pinning it to a point in time if one is given. A point
+    in time search must not name an index or a preference because both are
+    inherited from the point in time. If the point in time has expired, fall
+    back to a plain `search_after` query so that the cursor keeps working.
+    """
+    if not pit_id:
+        return s.execute()
+    pinned = s.index().params(preference=None).extra(
+        pit={'id': pit_id, 'keep_alive': settings.POINT_IN_TIME_KEEP_ALIVE}
+    )
+    try:
+        return pinned.execute()
+    except NotFoundError:
+        log.info('Point in time expired; continuing cursor without it.')
+        return s.execute()
+
+
+@lru_cache(maxsize=DOCUMENT_ID_LRU_SIZE)
+def get_document_id(uuid, index):
+    """
+    Convert an image's UUID to its sequential Elasticsearch document ID. The
+    mapping never changes, so it is kept in a small in-process LRU cache
+    backed by Redis, and Elasticsearch is only asked about images that
+    haven't been looked up recently.
+
+    :param uuid: The `identifier` of the image.
+    :param index: The Elasticsearch index holding the image.
+    :return: The `_id` of the image's document.
+    """
+    _id = cache.get(key=f'doc_id:{index}:{uuid}')
+    if _id is None:
+        _id, _ = _lookup_image(uuid, index)
+    return _id
+
+
+def _lookup_image(uuid, index) -> Tuple[str, List[str]]:
+    """
+    Find an image's document ID and precomputed related images in a single
+    request, and cache both.
+
+    :return: The `_id` of the image's document and the identifiers of its
+    related images.
     """
-    # Convert UUID to sequential ID.
     item = Search(index=index)
     item = item.query(
         'match',
         identifier=uuid
     )
-    _id = item.execute().hits[0].id
+    item = item.source(['related'])[0:1]
+    hit = item.execute().hits[0]
+    _id = hit.meta.id
+    related = list(getattr(hit, 'related', None) or [])
+    cache.set(
+        key=f'doc_id:{index}:{uuid}', value=_id,
+        timeout=DOCUMENT_ID_CACHE_TIMEOUT
+    )
+    cache.set(
+        key=f'related:{index}:{uuid}', value=related,
+        timeout=RELATED_CACHE_TIMEOUT
+    )
+    return _id, related
 
+
+def get_precomputed_related(uuid, index) -> List[str]:
+    """
+    Look up the related images the ingestion server stored for a popular
+    image after the last reindex. They are cached alongside the document ID
+    by `get_document_id`, so they only need to be looked up again once they
+    have expired.
+
+    :param uuid: The `identifier` of the image.
+    :param index: The Elasticsearch index holding the image.
+    :return: The identifiers of the related images in order, or an empty
+    list if none were precomputed.
+    """
+    related = cache.get(key=f'related:{index}:{uuid}')
+    if related is None:
+        _, related = _lookup_image(uuid, index)
+    return related
+
+
+def related_images(uuid, index, request, filter_dead):
+    """
+    Given a UUID, find related search results. Recommendations are the first
+    work to be shed when Elasticsearch is under pressure.
+    """
+    breaker.admit(LOW)
+    _id = get_document_id(uuid, index)
+    related = get_precomputed_related(uuid, index)
     s = Search(index=index)
-    s = s.query(
-        'more_like_this',
-        fields=['tags.name', 'title', 'creator'],
-        like={
-            '_index': index,
-            '_id': _id
-        },
-        min_term_freq=1,
-        max_query_terms=50
-    )
+    if related:
+        # Score each precomputed result by its rank so that they come back in
+        # the order they were stored in.
+        s = s.query(Q('bool', should=[
+            Q(
+                'constant_score',
+                filter=Q('term', **{'identifier.keyword': identifier}),
+                boost=len(related) - rank
+            )
+            for rank, identifier in enumerate(related)
+        ]))
+    else:
+        s = s.query(
+            'more_like_this',
+            fields=['tags.name', 'title', 'creator'],
+            like={
+                '_index': index,
+                '_id': _id
+            },
+            min_term_freq=1,
+            max_query_terms=50
+        )
     # Never show mature content in recommendations.
     s = s.exclude('term', mature=True)
     s = _exclude_filtered(s)
+    s = s.source(_get_result_source_fields())
     page_size = 10
     page = 1
     start, end = _get_query_slice(s, page_size, page, filter_dead)
     s = s[start:end]
-    response = s.execute()
-    results = _post_process_results(
+    with stage('es'):
+        response = hedged(
+            lambda preference: s.params(preference=preference).execute()
+        )
+    results, _ = _post_process_results(
         s,
         start,
         end,
@@ -388,55 +1244,125 @@ def related_images(uuid, index, request, filter_dead):
     return results, result_count
 
 
-def get_sources(index):
+def _read_sources_cache(cache_key) -> Optional[dict]:
     """
-    Given an index, find all available data sources and return their counts.
-
-    :param index: An Elasticsearch index, such as `'image'`.
-    :return: A dictionary mapping sources to the count of their images.`
+    Read a cached source count entry, treating anything unreadable or in an
+    outdated format as a miss.
     """
-    source_cache_name = 'sources-' + index
-    cache_fetch_failed = False
     try:
-        sources = cache.get(key=source_cache_name)
-    except ValueError:
-        cache_fetch_failed = True
-        sources = None
+        entry = cache.get(key=cache_key)
+    except Exception:
         log.warning('Source cache fetch failed due to corruption')
-    if type(sources) == list or cache_fetch_failed:
-        # Invalidate old provider format.
-        cache.delete(key=source_cache_name)
-    if not sources:
-        # Don't increase `size` without reading this issue first:
-        # https://github.com/elastic/elasticsearch/issues/18838
-        size = 100
-        agg_body = {
-            'aggs': {
-                'unique_sources': {
-                    'terms': {
-                        'field': 'source.keyword',
-                        'size': size,
-                        "order": {
-                            "_key": "desc"
-                        }
+        entry = None
+    valid = isinstance(entry, dict) \
+        and isinstance(entry.get('sources'), dict) \
+        and isinstance(entry.get('refresh_at'), (int, float))
+    if entry is not None and not valid:
+        cache.delete(key=cache_key)
+        return None
+    return entry
+
+
+def _compute_sources(index) -> dict:
+    # Don't increase `size` without reading this issue first:
+    # https://github.com/elastic/elasticsearch/issues/18838
+    size = 100
+    agg_body = {
+        'aggs': {
+            'unique_sources': {
+                'terms': {
+                    'field': 'source.keyword',
+                    'size': size,
+                    "order": {
+                        "_key": "desc"
                     }
                 }
             }
         }
-        try:
-            results = es.search(index=index, body=agg_body, request_cache=True)
-            buckets = results['aggregations']['unique_sources']['buckets']
-        except NotFoundError:
-            buckets = [{'key': 'none_found', 'doc_count': 0}]
-        sources = {result['key']: result['doc_count'] for result in buckets}
-        cache.set(
-            key=source_cache_name,
-            timeout=SOURCE_CACHE_TIMEOUT,
-            value=sources
-        )
+    }
+    try:
+        results = es.search(index=index, body=agg_body, request_cache=True)
+        buckets = results['aggregations']['unique_sources']['buckets']
+    except NotFoundError:
+        buckets = [{'key': 'none_found', 'doc_count': 0}]
+    return {result['key']: result['doc_count'] for result in buckets}
+
+
+def refresh_sources(index) -> dict:
+    """
+    Recompute the source counts of an index and cache them. Called when the
+    cached counts are due for a refresh and after a new index is promoted.
+
+    :param index: An Elasticsearch index, such as `'image'`.
+    :return: A dictionary mapping sources to the count of their images.
+    """
+    sources = _compute_sources(index)
+    cache.set(
+        key=SOURCE_CACHE_PREFIX + index,
+        timeout=SOURCE_CACHE_MAX_AGE,
+        value={
+            'sources': sources,
+            'refresh_at': time.time() + SOURCE_CACHE_TIMEOUT
+        }
+    )
     return sources
 
 
+def _refresh_sources_in_background(index):
+    lock_key = SOURCE_CACHE_PREFIX + index + ':refreshing'
+    try:
+        refresh_sources(index)
+    except Exception:
+        log.warning('Failed to refresh source counts', exc_info=True)
+    finally:
+        cache.delete(key=lock_key)
+
+
+def get_sources(index):
+    """
+    Given an index, find all available data sources and return their counts.
+
+    The counts are refreshed ahead of expiry: once they are
+    `SOURCE_CACHE_TIMEOUT` seconds old, one worker takes a lock and
+    recomputes them in the background while every worker keeps serving the
+    previous counts.
+
+    :param index: An Elasticsearch index, such as `'image'`.
+    :return: A dictionary mapping sources to the count of their images.`
+    """
+    cache_key = SOURCE_CACHE_PREFIX + index
+    lock_key = cache_key + ':refreshing'
+    entry = _read_sources_cache(cache_key)
+    if entry is not None:
+        stale = entry['refresh_at'] <= time.time()
+        if stale and cache.add(key=lock_key, value=True,
+                               timeout=SOURCE_REFRESH_LOCK_TTL):
+            threading.Thread(
+                target=_refresh_sources_in_background,
+                args=(index,),
+                daemon=True
+            ).start()
+        return entry['sources']
+    # Nothing to serve. Wait briefly for another worker that is already
+    # computing the counts before computing them ourselves.
+    locked = cache.add(
+        key=lock_key, value=True, timeout=SOURCE_REFRESH_LOCK_TTL
+    )
+    if not locked:
+        deadline = time.time() + SOURCE_LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(0.1)
+            entry = _read_sources_cache(cache_key)
+            if entry is not None:
+                return entry['sources']
+    try:
+        return refresh_sources(index)
+    finally:
+        # The lock may belong to the worker we gave up waiting for.
+        if locked:
+            cache.delete(key=lock_key)
+
+
 def _elasticsearch_connect():
     """
     Connect to configured Elasticsearch domain.
@@ -454,13 +1380,19 @@ def _elasticsearch_connect():
     _es = Elasticsearch(
         host=settings.ELASTICSEARCH_URL,
         port=settings.ELASTICSEARCH_PORT,
-        connection_class=RequestsHttpConnection,
+        connection_class=BreakerConnection,
         timeout=10,
         max_retries=1,
         retry_on_timeout=True,
         http_auth=auth,
         wait_for_status='yellow'
     )
+    # Keep enough connections open for concurrent requests to share instead
+    # of opening and discarding one per request.
+    adapter = HTTPAdapter(pool_maxsize=settings.ELASTICSEARCH_MAX_CONNECTIONS)
+    for conn in _es.transport.connection_pool.connections:
+        conn.session.mount('http://', adapter)
+        conn.session.mount('https://', adapter)
     _es.info()
     return _es
 
@@ -469,6 +1401,101 @@ es = _elasticsearch_connect()
 connections.connections.add_connection('default', es)
 
 
+def _get_last_allowed_page(page_size: int) -> int:
+    return int((MAX_PAGINATED_RESULTS + page_size / 2) / page_size)
+
+
+def get_exact_result_count(search_params, index) -> int:
+    """
+    Count every result of a search. Searches only count results as far as
+    they can be paginated, so this is a separate, cached request. The count
+    is shared by every page of the search.
+
+    :param search_params: Search parameters. See
+     :class: `ImageSearchQueryStringSerializer`.
+    :param index: The Elasticsearch index to search (e.g. 'image')
+    :return: The number of results.
+    """
+    s = _build_query(search_params, index, record_cost=False)
+    cache_key = 'exact_count:' + get_query_fingerprint(s, index=index)
+    count = cache.get(key=cache_key)
+    if count is None:
+        breaker.admit(LOW)
+        body = {'query': s.to_dict()['query']}
+        try:
+            count = es.count(index=index, body=body)['count']
+        except RequestError as e:
+            raise ValueError(e)
+        cache.set(key=cache_key, value=count, timeout=EXACT_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def get_facets(search_params, index) -> dict:
+    """
+    Count the values of each facet of a search in a single request. Each
+    facet is counted with every filter applied except its own, so the counts
+    show how many results there would be if that value were selected.
+
+    :param search_params: Search parameters. See
+     :class: `ImageSearchQueryStringSerializer`.
+    :param index: The Elasticsearch index to search (e.g. 'image')
+    :return: A dictionary mapping each facet, plus `license_type`, to a list
+    of values and their counts, most frequent first.
+    """
+    s = _build_query(
+        search_params, index, apply_filters=False, record_cost=False
+    )
+    filters = {}
+    for api_field, elasticsearch_field in FILTERS:
+        query = _get_filter(search_params, api_field, elasticsearch_field)
+        if query:
+            filters[api_field] = query
+    for facet, (field, own_filters) in FACETS.items():
+        others = [q for f, q in filters.items() if f not in own_filters]
+        s.aggs.bucket(facet, 'filter', Q('bool', filter=others))\
+            .bucket('values', 'terms', field=field, size=FACET_SIZE)
+    if filters:
+        s = s.post_filter(Q('bool', filter=list(filters.values())))
+    # Only the aggregations are needed, and requests without hits can be
+    # served from the shard request cache.
+    s = s.sort().source(False).extra(track_total_hits=False)[0:0]
+    cache_key = 'facets:' + get_query_fingerprint(s, index=index)
+    facets = cache.get(key=cache_key)
+    if facets is not None:
+        return facets
+    try:
+        with stage('es'):
+            response = s.params(request_cache=True, request_timeout=7)\
+                .execute()
+    except RequestError as e:
+        raise ValueError(e)
+    facets = {
+        facet: [
+            {'value': bucket.key, 'count': bucket.doc_count}
+            for bucket in response.aggregations[facet]['values'].buckets
+        ]
+        for facet in FACETS
+    }
+    facets['license_type'] = _count_license_types(facets['license'])
+    cache.set(key=cache_key, value=facets, timeout=FACET_CACHE_TIMEOUT)
+    return facets
+
+
+def _count_license_types(license_counts: List[dict]) -> List[dict]:
+    """
+    Every image has a single license, so the number of results of each
+    license type is the sum of the counts of its licenses.
+    """
+    counts = []
+    for license_type, licenses in LICENSE_GROUPS.items():
+        count = sum(
+            c['count'] for c in license_counts
+            if c['value'].upper() in licenses
+        )
+        counts.append({'value': license_type, 'count': count})
+    return sorted(counts, key=lambda c: c['count'], reverse=True)
+
+
 def _get_result_and_page_count(response_obj: Response, results: List[Hit],
                                page_size: int) -> Tuple[int, int]:
     """
@@ -481,8 +1508,7 @@ def _get_result_and_page_count(response_obj: Response, results: List[Hit],
     """
     result_count = response_obj.hits.total.value
     natural_page_count = int(result_count / page_size)
-    last_allowed_page = int((5000 + page_size / 2) / page_size)
-    page_count = min(natural_page_count, last_allowed_page)
+    page_count = min(natural_page_count, _get_last_allowed_page(page_size))
     if len(results) < page_size and page_count == 0:
         result_count = len(results)
 
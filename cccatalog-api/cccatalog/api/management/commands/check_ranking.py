@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from cccatalog.api.controllers import search_controller
+from cccatalog.api.controllers.search_controller import QUERY_RANKING, \
+    RESCORE_RANKING
+from cccatalog.api.serializers.image_serializers import \
+    ImageSearchQueryStringSerializer
+
+# Queries against the `search-qa` index and the identifier of the result that
+# must rank first. See `ingestion_server.qa`.
+QA_QUERIES = {
+    'home office': '1'
+}
+QA_INDEX = 'search-qa'
+
+
+class Command(BaseCommand):
+    help = 'Compare the top results of query-time and rescored ranking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index',
+            default=QA_INDEX,
+            help='Index to search. Defaults to the QA index.'
+        )
+        parser.add_argument(
+            '--query',
+            action='append',
+            default=None,
+            help='Query to compare. May be repeated. Defaults to the QA '
+                 'queries.'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of top results to compare.'
+        )
+
+    def handle(self, *args, **options):
+        index = options['index']
+        queries = options['query'] or list(QA_QUERIES)
+        failures = []
+        for query in queries:
+            params = ImageSearchQueryStringSerializer(data={'q': query})
+            params.is_valid(raise_exception=True)
+            top = {}
+            for mode in (QUERY_RANKING, RESCORE_RANKING):
+                s = search_controller._build_query(
+                    params, index, ranking_mode=mode
+                )
+                response = s[0:options['top']].execute()
+                top[mode] = [hit.identifier for hit in response]
+            shared = set(top[QUERY_RANKING]) & set(top[RESCORE_RANKING])
+            self.stdout.write(
+                f'{query!r}: {len(shared)} of {len(top[QUERY_RANKING])} top '
+                f'results shared, first result '
+                f'{top[QUERY_RANKING][:1]} (query) vs '
+                f'{top[RESCORE_RANKING][:1]} (rescore)'
+            )
+            expected = QA_QUERIES.get(query) if index == QA_INDEX else None
+            for mode, identifiers in top.items():
+                if expected and identifiers[:1] != [expected]:
+                    failures.append(
+                        f'{query!r} ranked {identifiers[:1]} first with '
+                        f'{mode} ranking; expected {expected}'
+                    )
+        if failures:
+            raise CommandError('\n'.join(failures))
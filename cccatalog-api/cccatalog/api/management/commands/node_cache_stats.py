@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from cccatalog.api.controllers.search_controller import es
+
+CACHES = ('request_cache', 'query_cache')
+
+
+def _sample():
+    stats = es.nodes.stats(
+        metric='indices', index_metric=','.join(CACHES)
+    )['nodes']
+    return {
+        node['name']: {
+            cache: (node['indices'][cache]['hit_count'],
+                    node['indices'][cache]['miss_count'])
+            for cache in CACHES
+        }
+        for node in stats.values()
+    }
+
+
+class Command(BaseCommand):
+    help = 'Report the cache hit rate of each Elasticsearch node.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds to measure hits and misses over.'
+        )
+
+    def handle(self, *args, **options):
+        before = _sample()
+        time.sleep(options['interval'])
+        after = _sample()
+        for name in sorted(after):
+            rates = []
+            for cache in CACHES:
+                hits, misses = after[name][cache]
+                prev_hits, prev_misses = before.get(name, {}).get(
+                    cache, (0, 0)
+                )
+                hits, misses = hits - prev_hits, misses - prev_misses
+                lookups = hits + misses
+                rate = f'{hits / lookups:.1%}' if lookups else 'n/a'
+                rates.append(f'{cache} {rate} of {lookups}')
+            self.stdout.write(f'{name}: ' + ', '.join(rates))
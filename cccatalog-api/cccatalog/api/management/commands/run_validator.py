@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from cccatalog.api.utils.background_validator import run_validator
+
+
+class Command(BaseCommand):
+    help = 'Validate image links queued by searches with deferred validation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1,
+            help='Seconds to wait before checking an empty queue again.'
+        )
+
+    def handle(self, *args, **options):
+        run_validator(poll_interval=options['poll_interval'])
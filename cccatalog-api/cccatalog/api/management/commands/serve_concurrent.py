@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+from cccatalog import settings
+
+
+class Command(BaseCommand):
+    help = 'Serve the API from a single process that handles many requests ' \
+           'at once, switching between them while they wait on I/O.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument(
+            '--max-concurrency',
+            type=int,
+            default=settings.MAX_CONCURRENT_REQUESTS,
+            help='The most requests to handle at once. Each in-flight '
+                 'request may hold a database connection.'
+        )
+
+    def handle(self, *args, **options):
+        # manage.py has already patched the standard library for gevent, so
+        # Elasticsearch, Redis, database and upstream HTTP calls all yield to
+        # other requests while they wait.
+        from cccatalog.wsgi import application
+        address = (options['host'], options['port'])
+        server = WSGIServer(
+            address, application, spawn=Pool(options['max_concurrency'])
+        )
+        self.stdout.write(
+            f'Serving on {address[0]}:{address[1]} with up to '
+            f'{options["max_concurrency"]} concurrent requests'
+        )
+        server.serve_forever()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from cccatalog.api.utils.cache_warmer import run_cache_warmer, \
+    TOP_SEARCHES, WARM_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = 'Warm the caches of each index whenever a new one is promoted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index',
+            action='append',
+            default=None,
+            help='Index alias to watch. May be repeated. Defaults to image.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=60,
+            help='Seconds between checks for a newly promoted index.'
+        )
+        parser.add_argument(
+            '--top-searches',
+            type=int,
+            default=TOP_SEARCHES,
+            help='How many of the most frequent searches to replay. 0 '
+                 'disables replaying searches.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=WARM_CONCURRENCY,
+            help='How many searches to replay at once.'
+        )
+
+    def handle(self, *args, **options):
+        run_cache_warmer(
+            aliases=options['index'] or ['image'],
+            poll_interval=options['poll_interval'],
+            top_searches=options['top_searches'],
+            concurrency=options['concurrency']
+        )
@@ -4,8 +4,11 @@ from cccatalog.api.licenses import LICENSE_GROUPS, get_license_url
 from django.urls import reverse
 from urllib.parse import urlparse
 from collections import namedtuple
-from cccatalog.api.controllers.search_controller import get_sources
+from typing import List
+from cccatalog.api.controllers.search_controller import get_sources, \
+    decode_cursor, cursor_pagination_available, START_CURSOR
 from cccatalog.api.models import ImageReport
+from cccatalog import settings
 
 
 def _validate_page(value):
@@ -121,6 +124,15 @@ class ImageSearchQueryStringSerializer(serializers.Serializer):
         required=False,
         default=True
     )
+    defer_validation = serializers.BooleanField(
+        label="defer_validation",
+        help_text="If enabled along with `filter_dead`, only links that are "
+                  "already known to be dead are filtered out, and results "
+                  "are returned right away. Unchecked links are validated in "
+                  "the background and filtered out of later requests.",
+        required=False,
+        default=settings.DEFER_LINK_VALIDATION
+    )
     source = serializers.CharField(
         label="provider",
         help_text="A comma separated list of data sources to search. Valid "
@@ -165,6 +177,30 @@ class ImageSearchQueryStringSerializer(serializers.Serializer):
         required=False,
         default=False
     )
+    highlight = serializers.BooleanField(
+        label='highlight',
+        help_text="If enabled, each result includes the fragments of its "
+                  "title, description and tags that matched the query.",
+        required=False,
+        default=False
+    )
+    exact_count = serializers.BooleanField(
+        label='exact_count',
+        help_text="If enabled, `result_count` counts every result instead of "
+                  "stopping at the pagination limit. Slower for broad "
+                  "queries.",
+        required=False,
+        default=False
+    )
+    cursor = serializers.CharField(
+        label='cursor',
+        help_text="The `next_cursor` value from a previous response. Resumes "
+                  "the search after the last result of that page. Unlike "
+                  "`page`, cursors are not limited by pagination depth. "
+                  "Pass `start` to get the first page of a walk through the "
+                  "results. When given, `page` is ignored.",
+        required=False
+    )
 
     @staticmethod
     def validate_q(value):
@@ -213,6 +249,21 @@ class ImageSearchQueryStringSerializer(serializers.Serializer):
         input_sources = ','.join(input_sources)
         return input_sources.lower()
 
+    @staticmethod
+    def validate_cursor(value):
+        if not cursor_pagination_available():
+            raise serializers.ValidationError(
+                'Cursor pagination is not available with the current '
+                'ranking mode.'
+            )
+        if value == START_CURSOR:
+            return value
+        try:
+            decode_cursor(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
     @staticmethod
     def validate_extension(value):
         return value.lower()
@@ -272,6 +323,18 @@ def _add_protocol(url: str):
 class ImageSerializer(serializers.Serializer):
     """ A single image. Used in search results."""
     requires_context = True
+    # The document fields read by each field that isn't read straight from
+    # the image's search document.
+    COMPUTED_FROM = {
+        'thumbnail': ['identifier'],
+        'license': ['license'],
+        'license_url': ['license', 'license_version', 'license_url'],
+        # Read from the search hit's metadata
+        'fields_matched': [],
+        'highlight': [],
+        # Only stored in the database
+        'attribution': []
+    }
     title = serializers.CharField(
         help_text="The name of image.",
         required=False
@@ -337,6 +400,12 @@ class ImageSerializer(serializers.Serializer):
         required=False,
         help_text="List the fields that matched the query for this result."
     )
+    highlight = serializers.DictField(
+        required=False,
+        child=serializers.ListField(child=serializers.CharField()),
+        help_text="The fragments of each field that matched the query. Only "
+                  "included if `highlight` is enabled."
+    )
     height = serializers.IntegerField(
         required=False,
         help_text="The height of the image in pixels. Not always available."
@@ -352,6 +421,22 @@ class ImageSerializer(serializers.Serializer):
                   "legal attribution requirements."
     )
 
+    @classmethod
+    def document_fields(cls) -> List[str]:
+        """
+        The fields of an image's search document that this serializer reads.
+        """
+        fields = set()
+        for name, field in cls._declared_fields.items():
+            if name in cls.COMPUTED_FROM or \
+                    isinstance(field, serializers.SerializerMethodField):
+                fields.update(cls.COMPUTED_FROM[name])
+            elif isinstance(field, serializers.HyperlinkedIdentityField):
+                fields.add(field.lookup_field)
+            else:
+                fields.add(field.source or name)
+        return sorted(fields)
+
     def get_license(self, obj):
         return obj.license.lower()
 
@@ -400,12 +485,24 @@ class ImageSearchResultsSerializer(serializers.Serializer):
     result_count = serializers.IntegerField(
         help_text="The total number of images returned by search result."
     )
+    result_count_lower_bound = serializers.BooleanField(
+        required=False,
+        help_text="If true, there are at least `result_count` results. Only "
+                  "results that can be paginated are counted unless "
+                  "`exact_count` is enabled."
+    )
     page_count = serializers.IntegerField(
         help_text="The total number of pages returned by search result."
     )
     page_size = serializers.IntegerField(
         help_text="The number of images per page."
     )
+    next_cursor = serializers.CharField(
+        required=False,
+        allow_null=True,
+        help_text="Pass as `cursor` to retrieve the next page of results. "
+                  "Null when there are no more results."
+    )
     results = ImageSerializer(
         many=True,
         help_text="An array of images and their details such as `title`, `id`, "
@@ -416,6 +513,50 @@ class ImageSearchResultsSerializer(serializers.Serializer):
     )
 
 
+class ImageBatchSearchSerializer(serializers.Serializer):
+    """ Parse and validate a batch of searches. """
+    MAX_SEARCHES = 10
+
+    queries = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=MAX_SEARCHES,
+        help_text="A list of up to {} searches. Each search is an object "
+                  "holding the same parameters as an image search query "
+                  "string.".format(MAX_SEARCHES)
+    )
+
+
+class ImageBatchSearchResultsSerializer(serializers.Serializer):
+    """ The responses to a batch of image searches. """
+    results = ImageSearchResultsSerializer(
+        many=True,
+        help_text="The response to each search, in the order the searches "
+                  "were given."
+    )
+
+
+class FacetValueSerializer(serializers.Serializer):
+    """ The number of results with a value of a facet. """
+    value = serializers.CharField(
+        help_text="A value of the facet, as accepted by the filter of the "
+                  "same name."
+    )
+    count = serializers.IntegerField(
+        help_text="The number of results with this value."
+    )
+
+
+class ImageFacetsSerializer(serializers.Serializer):
+    """ The number of results for each value of each search filter. """
+    facets = serializers.DictField(
+        child=FacetValueSerializer(many=True),
+        help_text="The values of each of `license`, `license_type`, "
+                  "`source`, `extension`, `categories`, `aspect_ratio` and "
+                  "`size`, most frequent first."
+    )
+
+
 class InputErrorSerializer(serializers.Serializer):
     """ Returned if invalid query parameters are passed. """
     error = serializers.CharField(
@@ -0,0 +1,160 @@
+import json
+import time
+import logging
+from typing import List, Tuple, Optional
+from django_redis import get_redis_connection
+from cccatalog.api.utils.validate_images import verify_image_urls, \
+    cache_image_statuses, is_dead
+from cccatalog.api.utils.dead_link_mask import mark_dead_link, \
+    record_dead_link_stats
+"""
+Validate image links off of the request path.
+
+When a search defers validation, links that aren't in the `valid:` cache are
+served as if they were alive and pushed onto a queue in Redis. Validator
+workers (`python manage.py run_validator`) pull links off of the queue, check
+them, cache their statuses, and flag dead results in the dead link mask of
+the query that produced them, so the next page or the next user gets
+filtered results.
+"""
+
+log = logging.getLogger(__name__)
+
+QUEUE_KEY = 'validation_queue'
+STATS_KEY = 'validation_stats'
+PENDING_PREFIX = 'validation_pending:'
+# Don't queue the same link again while it is waiting to be validated.
+PENDING_TTL = 60 * 10
+# How many links a worker validates at once.
+BATCH_SIZE = 50
+METRIC_PREFIX = 'cccatalog_validation_'
+
+
+def enqueue_validation(links: List[Tuple[str, str, Optional[str], int]]):
+    """
+    Queue links for background validation.
+
+    :param links: A list of (url, source, query hash, position in the query
+    results) tuples. The query hash may be None if the query has no dead link
+    mask.
+    """
+    if not links:
+        return
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline()
+    for url, _, _, _ in links:
+        pipe.set(PENDING_PREFIX + url, 1, nx=True, ex=PENDING_TTL)
+    newly_pending = pipe.execute()
+    now = time.time()
+    to_queue = [
+        json.dumps({
+            'url': url,
+            'source': source,
+            'query_hash': query_hash,
+            'position': position,
+            'enqueued_at': now
+        })
+        for (url, source, query_hash, position), pending
+        in zip(links, newly_pending) if pending
+    ]
+    if to_queue:
+        redis.rpush(QUEUE_KEY, *to_queue)
+
+
+def validate_queued_links(batch_size=BATCH_SIZE) -> int:
+    """
+    Validate one batch of queued links.
+
+    :return: The number of links validated.
+    """
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline()
+    pipe.lrange(QUEUE_KEY, 0, batch_size - 1)
+    pipe.ltrim(QUEUE_KEY, batch_size, -1)
+    raw_items, _ = pipe.execute()
+    if not raw_items:
+        return 0
+    items = [json.loads(item) for item in raw_items]
+    urls = [item['url'] for item in items]
+    statuses = verify_image_urls(urls)
+    cache_image_statuses(dict(zip(urls, statuses)))
+
+    source_counts = {}
+    for item, status in zip(items, statuses):
+        validated, dead = source_counts.get(item['source'], (0, 0))
+        if is_dead(status):
+            dead += 1
+            if item['query_hash'] is not None:
+                mark_dead_link(item['query_hash'], item['position'])
+        source_counts[item['source']] = (validated + 1, dead)
+    record_dead_link_stats(source_counts)
+
+    # The lag is how long the oldest link in the batch waited in the queue.
+    lag = time.time() - min(item['enqueued_at'] for item in items)
+    pipe = redis.pipeline()
+    pipe.delete(*[PENDING_PREFIX + url for url in urls])
+    pipe.hincrby(STATS_KEY, 'validated', len(items))
+    pipe.hset(STATS_KEY, 'lag_seconds', lag)
+    pipe.execute()
+    return len(items)
+
+
+def get_validator_stats() -> dict:
+    """
+    Report the depth of the validation queue and how far behind the
+    validators are.
+    """
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline()
+    pipe.llen(QUEUE_KEY)
+    pipe.lindex(QUEUE_KEY, 0)
+    pipe.hmget(STATS_KEY, ['validated', 'lag_seconds'])
+    queue_depth, oldest, (validated, lag) = pipe.execute()
+    if oldest is not None:
+        oldest_age = time.time() - json.loads(oldest)['enqueued_at']
+    else:
+        oldest_age = 0
+    return {
+        'queue_depth': queue_depth,
+        'oldest_queued_seconds': oldest_age,
+        'validated': int(validated) if validated is not None else 0,
+        'lag_seconds': float(lag) if lag is not None else 0
+    }
+
+
+def render_validator_stats(stats: dict) -> str:
+    """
+    Format validator stats in the Prometheus text exposition format.
+    """
+    metrics = [
+        ('queue_depth', 'gauge', 'Links waiting to be validated.'),
+        ('oldest_queued_seconds', 'gauge',
+         'How long the oldest queued link has been waiting.'),
+        ('lag_seconds', 'gauge',
+         'How long the oldest link of the last batch waited.'),
+        ('validated', 'counter', 'Links validated in the background.')
+    ]
+    lines = []
+    for stat, kind, description in metrics:
+        name = METRIC_PREFIX + stat
+        if kind == 'counter':
+            name += '_total'
+        lines += [
+            f'# HELP {name} {description}',
+            f'# TYPE {name} {kind}',
+            f'{name} {stats[stat]}'
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def run_validator(poll_interval=1):
+    """
+    Validate queued links forever. Sleep whenever the queue is empty.
+    """
+    log.info('Starting background link validator')
+    while True:
+        validated = validate_queued_links()
+        if validated:
+            log.info(f'validator_stats={json.dumps(get_validator_stats())}')
+        else:
+            time.sleep(poll_interval)
@@ -0,0 +1,152 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
+from django.db import connection, DatabaseError
+from elasticsearch.exceptions import NotFoundError
+from cccatalog.api.controllers import search_controller
+from cccatalog.api.serializers.image_serializers import \
+    ImageSearchQueryStringSerializer
+from cccatalog.api.utils.preference import get_preference
+"""
+Warm the API's caches whenever the ingestion server promotes a new index.
+
+Promotion swaps the concrete index behind an alias such as `image`. The
+cache warmer (`python manage.py warm_caches`) polls the aliases and, when one
+points somewhere new, recomputes the cached values that depend on the
+index's contents before user traffic has to. It also replays the most
+frequent searches recorded by the analytics server so that they are served
+from the search cache. The ingestion server replays the same searches
+against the new index before promoting it to warm Elasticsearch's own caches.
+"""
+
+log = logging.getLogger(__name__)
+
+# How many of the most frequent searches are replayed
+TOP_SEARCHES = 100
+# How far back to count searches (in days)
+TOP_SEARCHES_WINDOW_DAYS = 7
+# How many searches are replayed at once
+WARM_CONCURRENCY = 4
+
+
+def get_live_index(alias: str) -> Optional[str]:
+    """
+    Find the concrete index an alias points to.
+    """
+    try:
+        aliases = search_controller.es.indices.get_alias(name=alias)
+    except NotFoundError:
+        return None
+    return next(iter(aliases), None)
+
+
+def get_top_searches(limit: int) -> List[str]:
+    """
+    Find the most frequent search terms in the analytics tables. The daily
+    `top_searches` reports are used if there are any; otherwise the raw
+    search events are counted.
+
+    :param limit: The maximum number of terms to return.
+    :return: A list of search terms, most frequent first.
+    """
+    queries = [
+        """
+        SELECT term FROM top_searches
+        WHERE end_time > now() - %s * interval '1 day'
+        GROUP BY term
+        ORDER BY sum(hits) DESC
+        LIMIT %s
+        """,
+        """
+        SELECT query FROM search_event
+        WHERE timestamp > now() - %s * interval '1 day'
+        GROUP BY query
+        ORDER BY count(*) DESC
+        LIMIT %s
+        """
+    ]
+    for query in queries:
+        try:
+            with connection.cursor() as cur:
+                cur.execute(query, [TOP_SEARCHES_WINDOW_DAYS, limit])
+                terms = [row[0] for row in cur.fetchall() if row[0]]
+        except DatabaseError:
+            log.warning('Could not read search analytics', exc_info=True)
+            terms = []
+        if terms:
+            return terms
+    return []
+
+
+def _replay_search(alias: str, term: str) -> bool:
+    params = ImageSearchQueryStringSerializer(data={'q': term})
+    if not params.is_valid():
+        return False
+    try:
+        search_controller.search(
+            params,
+            alias,
+            params.data['page_size'],
+            get_preference(term),
+            None,
+            params.data['filter_dead']
+        )
+        return True
+    except Exception:
+        log.warning(f'Failed to replay search {term!r}', exc_info=True)
+        return False
+    finally:
+        connection.close()
+
+
+def warm_searches(alias: str, limit=TOP_SEARCHES,
+                  concurrency=WARM_CONCURRENCY) -> int:
+    """
+    Replay the most frequent searches against `alias` with the default
+    search parameters, at most `concurrency` at a time.
+
+    :return: The number of searches replayed.
+    """
+    terms = get_top_searches(limit)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return sum(pool.map(partial(_replay_search, alias), terms))
+
+
+def warm_caches(alias: str, top_searches=TOP_SEARCHES,
+                concurrency=WARM_CONCURRENCY):
+    """
+    Recompute everything cached about the index behind `alias`.
+    """
+    start_time = time.time()
+    search_controller.refresh_sources(alias)
+    replayed = 0
+    if top_searches:
+        replayed = warm_searches(alias, top_searches, concurrency)
+    log.info(
+        f'Warmed caches for {alias} and replayed {replayed} searches in '
+        f'{time.time() - start_time:.2f}s'
+    )
+
+
+def run_cache_warmer(aliases: List[str], poll_interval=60,
+                     top_searches=TOP_SEARCHES,
+                     concurrency=WARM_CONCURRENCY):
+    """
+    Warm the caches of each alias at startup and after every promotion.
+    """
+    log.info(f'Watching {aliases} for index promotions')
+    live_indices = {}
+    while True:
+        for alias in aliases:
+            live_index = get_live_index(alias)
+            if live_index is None or live_index == live_indices.get(alias):
+                continue
+            log.info(f'{alias} now points to {live_index}')
+            try:
+                warm_caches(alias, top_searches, concurrency)
+                live_indices[alias] = live_index
+            except Exception:
+                log.warning(f'Failed to warm caches for {alias}', exc_info=True)
+        time.sleep(poll_interval)
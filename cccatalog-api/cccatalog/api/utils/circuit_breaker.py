@@ -0,0 +1,211 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from math import ceil
+from elasticsearch import RequestsHttpConnection
+from elasticsearch.exceptions import TransportError
+from rest_framework.exceptions import APIException
+from cccatalog import settings
+"""
+A circuit breaker around Elasticsearch requests.
+
+When the cluster slows down, every worker waits on its requests until they
+time out, the worker pool saturates and requests that don't touch
+Elasticsearch at all, such as health checks, queue behind them. Instead, each
+worker keeps a rolling window of the latency and outcome of its recent
+Elasticsearch requests and sheds work while they look unhealthy:
+
+- CLOSED: everything is sent.
+- SHEDDING: the 90th percentile latency or the error rate is elevated. Low
+  priority work, such as related images, deep pages, exact counts and the
+  re-queries that top up pages with dead links, is skipped or refused with a
+  503, so that first pages of searches are still served.
+- OPEN: the cluster is failing or barely answering. Every request is refused
+  with a 503 for COOLDOWN seconds.
+- HALF_OPEN: after the cooldown, the window is cleared and only a
+  HALF_OPEN_RATE share of high priority requests is let through as probes.
+  Once HALF_OPEN_PROBES of them have answered with a healthy latency and
+  error rate the breaker closes; otherwise it opens again. Letting everything
+  through at once would pile the backlog onto a cluster that is still
+  recovering.
+
+Searches served from the search cache never reach the breaker.
+"""
+
+log = logging.getLogger(__name__)
+
+HIGH = 'high'
+LOW = 'low'
+
+CLOSED = 'closed'
+SHEDDING = 'shedding'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# How far back requests are considered, in seconds
+WINDOW = 10
+# The most requests kept in the window
+MAX_SAMPLES = 1000
+# Don't judge the cluster on fewer requests than this
+MIN_REQUESTS = 20
+# The share of failed requests that opens the breaker. Half of it is enough to
+# start shedding.
+ERROR_RATE = 0.5
+# How long the breaker stays open, in seconds
+COOLDOWN = 5
+# The share of high priority requests let through while half open
+HALF_OPEN_RATE = 0.1
+# How many probes must answer before the breaker closes
+HALF_OPEN_PROBES = 10
+# The state is re-evaluated at most this often, in seconds
+EVALUATE_INTERVAL = 0.5
+# Sent as Retry-After when low priority work is shed
+SHED_RETRY_AFTER = 5
+
+
+class Overloaded(APIException):
+    status_code = 503
+    default_detail = 'Search is temporarily overloaded. Try again shortly.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        # Rendered as the `Retry-After` header by the exception handler
+        self.wait = wait
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=MAX_SAMPLES)
+        self._state = CLOSED
+        self._open_until = 0
+        self._evaluated_at = 0
+
+    def record(self, latency_ms: float, failed: bool):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency_ms, failed))
+
+    def percentile(self, percent: float, min_samples=1) -> float:
+        """
+        The given percentile of the latency of the requests in the window, in
+        milliseconds, or 0 if there were fewer than `min_samples`.
+        """
+        with self._lock:
+            latencies = sorted(s[1] for s in self._recent())
+        if not latencies or len(latencies) < min_samples:
+            return 0
+        idx = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+        return latencies[idx]
+
+    def _recent(self):
+        cutoff = time.monotonic() - WINDOW
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return self._samples
+
+    @staticmethod
+    def _health(samples):
+        """ The error rate and 90th percentile latency of some samples. """
+        error_rate = sum(1 for s in samples if s[2]) / len(samples)
+        latencies = sorted(s[1] for s in samples)
+        return error_rate, latencies[int(len(latencies) * 0.9)]
+
+    def _open(self, now) -> str:
+        self._open_until = now + COOLDOWN
+        return OPEN
+
+    def _evaluate(self, now) -> str:
+        if self._open_until:
+            if now < self._open_until:
+                return OPEN
+            # Let probes through and judge the cluster on them alone.
+            self._open_until = 0
+            self._samples.clear()
+            return HALF_OPEN
+        samples = self._recent()
+        if self._state == HALF_OPEN:
+            failed = sum(1 for s in samples if s[2])
+            if failed >= HALF_OPEN_PROBES * ERROR_RATE / 2:
+                # The probes can no longer turn out healthy.
+                return self._open(now)
+            if len(samples) < HALF_OPEN_PROBES:
+                return HALF_OPEN
+            error_rate, p90 = self._health(samples)
+            if error_rate < ERROR_RATE / 2 and \
+                    p90 < settings.CIRCUIT_BREAKER_SHED_LATENCY_MS:
+                return CLOSED
+            return self._open(now)
+        if len(samples) < MIN_REQUESTS:
+            return CLOSED
+        error_rate, p90 = self._health(samples)
+        if error_rate >= ERROR_RATE or \
+                p90 >= settings.CIRCUIT_BREAKER_OPEN_LATENCY_MS:
+            return self._open(now)
+        if error_rate >= ERROR_RATE / 2 or \
+                p90 >= settings.CIRCUIT_BREAKER_SHED_LATENCY_MS:
+            return SHEDDING
+        return CLOSED
+
+    def state(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._evaluated_at >= EVALUATE_INTERVAL:
+                state = self._evaluate(now)
+                if state != self._state:
+                    log.warning(
+                        f'Elasticsearch circuit breaker {self._state} -> '
+                        f'{state}'
+                    )
+                self._state = state
+                self._evaluated_at = now
+            return self._state
+
+    def admit(self, priority=HIGH):
+        """
+        Raise `Overloaded` if work of the given priority should not be sent
+        to Elasticsearch right now.
+        """
+        if not settings.USE_CIRCUIT_BREAKER:
+            return
+        state = self.state()
+        if state == OPEN:
+            raise Overloaded(ceil(max(self._open_until - time.monotonic(), 1)))
+        if state == SHEDDING and priority == LOW:
+            raise Overloaded(SHED_RETRY_AFTER)
+        if state == HALF_OPEN and \
+                (priority == LOW or random.random() >= HALF_OPEN_RATE):
+            raise Overloaded(SHED_RETRY_AFTER)
+
+    def should_shed(self) -> bool:
+        """
+        Whether optional work, which can be skipped without failing the
+        request, should be skipped.
+        """
+        return settings.USE_CIRCUIT_BREAKER and self.state() != CLOSED
+
+
+breaker = CircuitBreaker()
+
+
+class BreakerConnection(RequestsHttpConnection):
+    """
+    Records the latency and outcome of every Elasticsearch request in the
+    circuit breaker. Client errors, such as malformed queries, are not held
+    against the cluster.
+    """
+    def perform_request(self, *args, **kwargs):
+        start = time.monotonic()
+        failed = False
+        try:
+            return super().perform_request(*args, **kwargs)
+        except TransportError as e:
+            # Connection errors and timeouts have no status code.
+            status = e.status_code
+            failed = not isinstance(status, int) or status >= 500 or \
+                status == 429
+            raise
+        finally:
+            breaker.record((time.monotonic() - start) * 1000, failed)
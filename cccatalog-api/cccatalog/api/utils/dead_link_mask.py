@@ -1,53 +1,315 @@
 
-from typing import List
+import datetime
+import logging
+import struct
+from bisect import bisect_left
+from math import ceil
+from typing import List, Dict, Tuple, Optional
 from django_redis import get_redis_connection
-from deepdiff import DeepHash
 from elasticsearch_dsl import Search
+from redis.exceptions import WatchError
+from cccatalog.api.utils.query_fingerprint import get_query_fingerprint
+
+log = logging.getLogger(__name__)
 
 # 3 hours minutes (in seconds)
 DEAD_LINK_MASK_TTL = 60 * 60 * 3
+# Dead link statistics are bucketed by day and kept for two days.
+DEAD_LINK_STATS_TTL = 60 * 60 * 24 * 2
+# Pseudo-source under which statistics for every source are aggregated.
+ALL_SOURCES = '__all__'
+# Don't trust a dead link ratio measured from fewer validated links.
+MIN_DEAD_LINK_SAMPLE = 50
+# Number of results covered by each entry of a dead link mask's prefix-count
+# index.
+MASK_BLOCK_BITS = 512
+MASK_BLOCK_BYTES = MASK_BLOCK_BITS // 8
+# How often a mask update is retried when another writer gets there first
+MAX_SAVE_ATTEMPTS = 5
+
+_POPCOUNT = [bin(byte).count('1') for byte in range(256)]
 
 
 def get_query_hash(s: Search) -> str:
     """
-    Generates a deterministic Murmur3 or SHA256 hash from the serialized Search
-    object using DeepHash so that two Search objects with the same content will
-    produce the same hash.
+    Identifies a query by its fingerprint so that two Search objects with the
+    same content will share a dead link mask. See
+    `cccatalog.api.utils.query_fingerprint`.
 
     :param s: Search object to be serialized and hashed.
     :return: Serialized Search object hash.
     """
-    serialized_search_obj = s.to_dict()
-    serialized_search_obj.pop('from', None)
-    serialized_search_obj.pop('size', None)
-    deep_hash = DeepHash(serialized_search_obj)[serialized_search_obj]
-    return deep_hash
+    return get_query_fingerprint(s)
 
 
-def get_query_mask(query_hash: str) -> List[int]:
+class DeadLinkMask:
+    """
+    A query's dead link mask, stored in Redis as a bitmap in which bit `i` is
+    set if the `i`th result of the query is alive.
+
+    Alongside the bitmap, a prefix-count index records how many live results
+    precede each block of `MASK_BLOCK_BITS` results. Finding the result at
+    which a page starts is a binary search over the index followed by a scan
+    of a single block, so it does not require reading the whole mask.
     """
-    Fetches an existing query mask for a given query hash
-    or returns an empty one.
+
+    def __init__(self, query_hash: str, length: int,
+                 prefix_counts: List[int]):
+        self.query_hash = query_hash
+        self.length = length
+        # prefix_counts[j] is the number of live results before block j; the
+        # last entry is the number of live results in the whole mask.
+        self.prefix_counts = prefix_counts
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def alive(self) -> int:
+        return self.prefix_counts[-1]
+
+    def select(self, rank: int) -> int:
+        """
+        Find the position of the `rank`th live result (counting from 1).
+
+        :raises ValueError: if the mask has fewer live results than that.
+        """
+        if rank < 1 or rank > self.alive:
+            raise ValueError(f'{rank} is out of range')
+        block = bisect_left(self.prefix_counts, rank) - 1
+        remaining = rank - self.prefix_counts[block]
+        first_byte = block * MASK_BLOCK_BYTES
+        redis = get_redis_connection("default")
+        data = redis.getrange(
+            _mask_key(self.query_hash),
+            first_byte,
+            first_byte + MASK_BLOCK_BYTES - 1
+        )
+        for byte_idx, byte in enumerate(data):
+            count = _POPCOUNT[byte]
+            if remaining > count:
+                remaining -= count
+                continue
+            for bit in range(8):
+                if byte & (0x80 >> bit):
+                    remaining -= 1
+                    if not remaining:
+                        return (first_byte + byte_idx) * 8 + bit
+        # The bitmap changed since the index was read.
+        raise ValueError(f'{rank} is out of range')
+
+
+def _mask_key(query_hash: str) -> str:
+    return f'{query_hash}:dead_link_mask'
+
+
+def _index_key(query_hash: str) -> str:
+    return f'{query_hash}:dead_link_mask_index'
+
+
+def _pack_index(length: int, prefix_counts: List[int]) -> bytes:
+    """
+    Pack the mask length and prefix counts into a string of big-endian 32 bit
+    integers.
+    """
+    return struct.pack(f'>{len(prefix_counts) + 1}I', length, *prefix_counts)
+
+
+def _parse_index(index: bytes) -> Tuple[int, List[int]]:
+    length, *prefix_counts = struct.unpack(f'>{len(index) // 4}I', index)
+    return length, prefix_counts
+
+
+def get_query_mask(query_hash: str) -> Optional[DeadLinkMask]:
+    """
+    Fetches the index of an existing query mask for a given query hash.
 
     :param query_hash: Unique value for a particular query.
-    :return: Boolean mask as a list of integers (0 or 1).
+    :return: The query's DeadLinkMask, or None if it has none.
     """
     redis = get_redis_connection("default")
-    key = f'{query_hash}:dead_link_mask'
-    return list(map(int, redis.lrange(key, 0, -1)))
+    index = redis.get(_index_key(query_hash))
+    if not index:
+        return None
+    length, prefix_counts = _parse_index(index)
+    return DeadLinkMask(query_hash, length, prefix_counts)
 
 
-def save_query_mask(query_hash: str, mask: List):
+def _count_blocks(data: bytes) -> List[int]:
+    """
+    Count the live results in each block of a slice of a bitmap that starts
+    at a block boundary.
     """
-    Saves a query mask to redis.
+    return [
+        sum(_POPCOUNT[byte] for byte in data[offset:offset + MASK_BLOCK_BYTES])
+        for offset in range(0, len(data), MASK_BLOCK_BYTES)
+    ]
+
+
+def save_query_mask(query_hash: str, mask: List[int], start: int = 0):
+    """
+    Saves the validated slice of a query mask to redis, replacing anything
+    recorded from `start` onwards. Results before `start` that are missing
+    from the stored mask are assumed to be alive.
+
+    Only the bytes from the end of what is kept of the stored mask onwards
+    are written, and only the prefix counts of the blocks they fall in are
+    recomputed. The update is retried if another writer changes the mask in
+    the meantime.
 
-    :param mask: Boolean mask as a list of integers (0 or 1).
     :param query_hash: Unique value to be used as key.
+    :param mask: Boolean mask as a list of integers (0 or 1).
+    :param start: The position of the first result in `mask`.
     """
-    redis_pipe = get_redis_connection("default").pipeline()
-    key = f'{query_hash}:dead_link_mask'
+    mask_key, index_key = _mask_key(query_hash), _index_key(query_hash)
+    length = start + len(mask)
+    redis = get_redis_connection("default")
+    with redis.pipeline() as pipe:
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            try:
+                pipe.watch(mask_key, index_key)
+                index = pipe.get(index_key)
+                if index and pipe.exists(mask_key):
+                    stored_length, prefix_counts = _parse_index(index)
+                else:
+                    stored_length, prefix_counts = 0, [0]
+                kept = min(stored_length, start)
+                # The first changed byte, and the start of its block.
+                first_byte = kept // 8
+                first_block = kept // MASK_BLOCK_BITS
+                block_start = first_block * MASK_BLOCK_BYTES
+                head = pipe.getrange(mask_key, block_start, first_byte) \
+                    if kept % MASK_BLOCK_BITS else b''
+                head = bytearray(
+                    head.ljust(first_byte - block_start + 1, b'\0')
+                )
+
+                changed = bytearray(ceil(length / 8) - first_byte)
+                if changed and kept % 8:
+                    # Keep the stored results that share the first byte.
+                    changed[0] = head[-1] & (0xFF00 >> (kept % 8)) & 0xFF
+                for position in range(kept, start):
+                    changed[position // 8 - first_byte] |= \
+                        0x80 >> (position % 8)
+                for position, alive in enumerate(mask, start=start):
+                    if alive:
+                        changed[position // 8 - first_byte] |= \
+                            0x80 >> (position % 8)
+                counts = _count_blocks(bytes(head[:-1]) + bytes(changed))
+                prefix_counts = prefix_counts[:first_block + 1]
+                for count in counts:
+                    prefix_counts.append(prefix_counts[-1] + count)
+
+                pipe.multi()
+                if changed:
+                    pipe.setrange(mask_key, first_byte, bytes(changed))
+                pipe.expire(mask_key, DEAD_LINK_MASK_TTL)
+                pipe.set(
+                    index_key,
+                    _pack_index(length, prefix_counts),
+                    ex=DEAD_LINK_MASK_TTL
+                )
+                pipe.execute()
+                return
+            except WatchError:
+                continue
+    log.warning(f'Gave up saving the dead link mask of {query_hash}')
+
+
+def mark_dead_link(query_hash: str, position: int):
+    """
+    Flag a single result in an existing query mask as dead. Does nothing if
+    the mask has expired or doesn't reach that far.
+
+    :param query_hash: Unique value for a particular query.
+    :param position: The position of the dead result in the query results.
+    """
+    mask_key, index_key = _mask_key(query_hash), _index_key(query_hash)
+    redis = get_redis_connection("default")
+    with redis.pipeline() as pipe:
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            try:
+                pipe.watch(mask_key, index_key)
+                index = pipe.get(index_key)
+                if not index:
+                    return
+                length, prefix_counts = _parse_index(index)
+                if position >= length or not pipe.getbit(mask_key, position):
+                    return
+                ttl = pipe.ttl(mask_key)
+                if ttl <= 0:
+                    return
+                # Every block after the one holding the result has one less
+                # live result before it.
+                first_block = position // MASK_BLOCK_BITS + 1
+                for block in range(first_block, len(prefix_counts)):
+                    prefix_counts[block] -= 1
+                pipe.multi()
+                pipe.setbit(mask_key, position, 0)
+                pipe.set(
+                    index_key, _pack_index(length, prefix_counts), ex=ttl
+                )
+                pipe.execute()
+                return
+            except WatchError:
+                continue
 
-    redis_pipe.delete(key)
-    redis_pipe.rpush(key, *mask)
-    redis_pipe.expire(key, DEAD_LINK_MASK_TTL)
+
+def _get_stats_keys() -> List[str]:
+    today = datetime.date.today()
+    yesterday = today - datetime.timedelta(days=1)
+    return [f'dead_link_stats:{day.isoformat()}' for day in (today, yesterday)]
+
+
+def record_dead_link_stats(source_counts: Dict[str, Tuple[int, int]]):
+    """
+    Record how many links were validated and how many of those were dead,
+    per source.
+
+    :param source_counts: Maps each source to a tuple of validated and dead
+    link counts.
+    """
+    if not source_counts:
+        return
+    key = _get_stats_keys()[0]
+    redis_pipe = get_redis_connection("default").pipeline()
+    total_validated, total_dead = 0, 0
+    for source, (validated, dead) in source_counts.items():
+        redis_pipe.hincrby(key, f'{source}:validated', validated)
+        redis_pipe.hincrby(key, f'{source}:dead', dead)
+        total_validated += validated
+        total_dead += dead
+    redis_pipe.hincrby(key, f'{ALL_SOURCES}:validated', total_validated)
+    redis_pipe.hincrby(key, f'{ALL_SOURCES}:dead', total_dead)
+    redis_pipe.expire(key, DEAD_LINK_STATS_TTL)
     redis_pipe.execute()
+
+
+def get_dead_link_ratios(sources: List[str]) -> Dict[str, Optional[float]]:
+    """
+    Look up the fraction of dead links measured over the last day or two for
+    each source. `ALL_SOURCES` is always included.
+
+    :param sources: The sources to look up.
+    :return: Maps each source to its dead link ratio, or None if too few of
+    its links have been validated to say.
+    """
+    sources = list(set(sources) | {ALL_SOURCES})
+    fields = []
+    for source in sources:
+        fields += [f'{source}:validated', f'{source}:dead']
+    redis_pipe = get_redis_connection("default").pipeline()
+    for key in _get_stats_keys():
+        redis_pipe.hmget(key, fields)
+    counts = [0] * len(fields)
+    for bucket in redis_pipe.execute():
+        for idx, count in enumerate(bucket):
+            counts[idx] += int(count) if count is not None else 0
+    ratios = {}
+    for idx, source in enumerate(sources):
+        validated, dead = counts[2 * idx], counts[2 * idx + 1]
+        if validated >= MIN_DEAD_LINK_SAMPLE:
+            ratios[source] = dead / validated
+        else:
+            ratios[source] = None
+    return ratios
@@ -11,7 +11,12 @@ production web server configuration, and not reproducible locally.
 
 def parse_value_errors(errors):
     fields = ['q']
-    messages = [errors.args[0].info['error']['root_cause'][0]['reason']]
+    error = errors.args[0]
+    if isinstance(error, str):
+        # Raised by the API itself rather than by Elasticsearch
+        messages = [error]
+    else:
+        messages = [error.info['error']['root_cause'][0]['reason']]
     return fields, messages
 
 
@@ -0,0 +1,102 @@
+import queue
+import logging
+import threading
+import time
+from cccatalog import settings
+from cccatalog.api.utils.circuit_breaker import breaker, MIN_REQUESTS
+"""
+Hedge Elasticsearch searches against slow shard copies.
+
+A search waits for its slowest shard, so a single shard copy stalled by a
+garbage collection pause or a merge slows down every search routed to it. When
+a search hasn't answered within the rolling 95th percentile latency of the
+worker's recent Elasticsearch requests, a duplicate is sent without a
+`preference`, so that Elasticsearch's adaptive replica selection routes it
+away from the shard copies that are slow to answer, and whichever attempt
+answers first is used.
+
+Hedges are rate limited with a token bucket that gains HEDGE_RATE tokens per
+search, so they add at most that share of searches to the cluster's load.
+A token is set aside before a search starts. Searches that can't get one run
+inline, without a second thread, and searches that answer in time give
+theirs back. Nothing is hedged while the circuit breaker is shedding load.
+"""
+
+log = logging.getLogger(__name__)
+
+# Never hedge sooner than this, in milliseconds
+MIN_HEDGE_DELAY = 50
+# The most hedges that can be sent in a burst
+MAX_HEDGE_TOKENS = 10
+
+
+class _TokenBucket:
+    def __init__(self, capacity):
+        self._lock = threading.Lock()
+        self._capacity = capacity
+        self._tokens = capacity
+
+    def add(self, amount):
+        with self._lock:
+            self._tokens = min(self._capacity, self._tokens + amount)
+
+    def take(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+_budget = _TokenBucket(MAX_HEDGE_TOKENS)
+
+
+def _start_attempt(execute, preference, results):
+    def attempt():
+        try:
+            results.put((True, execute(preference)))
+        except Exception as e:
+            results.put((False, e))
+    threading.Thread(target=attempt, daemon=True).start()
+
+
+def hedged(execute, preference=None):
+    """
+    Execute a search, hedging it if it is slow.
+
+    :param execute: Executes the search with the `preference` it is given
+    and returns the response. A preference of None lets Elasticsearch choose
+    the shard copies.
+    :param preference: The search's own preference.
+    :return: The first successful response, or the first error if both
+    attempts fail.
+    """
+    if not settings.USE_HEDGED_REQUESTS:
+        return execute(preference)
+    _budget.add(settings.HEDGE_RATE)
+    delay = breaker.percentile(95, min_samples=MIN_REQUESTS)
+    if not delay or breaker.should_shed() or not _budget.take():
+        return execute(preference)
+    results = queue.Queue()
+    start = time.monotonic()
+    _start_attempt(execute, preference, results)
+    try:
+        ok, value = results.get(timeout=max(delay, MIN_HEDGE_DELAY) / 1000)
+        # Answered in time, so the hedge wasn't needed.
+        _budget.add(1)
+    except queue.Empty:
+        _start_attempt(execute, None, results)
+        ok, value = results.get()
+        if not ok:
+            # Wait for the other attempt before giving up.
+            error = value
+            ok, value = results.get()
+            if not ok:
+                value = error
+        log.info(
+            f'Hedged search after {delay:.0f}ms, answered in '
+            f'{(time.monotonic() - start) * 1000:.0f}ms'
+        )
+    if ok:
+        return value
+    raise value
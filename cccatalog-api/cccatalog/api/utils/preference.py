@@ -0,0 +1,74 @@
+import hashlib
+from cccatalog import settings
+"""
+Choose the Elasticsearch `preference` of a search.
+
+Searches with the same preference are served by the same shard copies, which
+keeps scores (and therefore pagination) consistent for a user and lets each
+node's caches serve the searches it has seen before. The preference is
+derived from a digest of the user's identity keyed with the Django secret
+key, so it is the same on every worker and every API server, unlike the
+per-process salted `hash()`.
+
+Users are grouped into SEARCH_PREFERENCE_BUCKETS buckets with jump consistent
+hashing. Users in a bucket share shard copies, so popular searches are
+cached on fewer nodes, and changing the number of buckets only moves the
+users of the buckets that are added or removed.
+"""
+
+_key = None
+
+
+def _get_key() -> bytes:
+    global _key
+    if _key is None:
+        secret = (settings.SECRET_KEY or '').encode('utf-8')
+        _key = hashlib.sha256(secret).digest()
+    return _key
+
+
+def _digest(identity: str) -> int:
+    digest = hashlib.blake2b(
+        identity.encode('utf-8'), key=_get_key(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _jump_hash(key: int, num_buckets: int) -> int:
+    """
+    Map a 64 bit key to one of `num_buckets` buckets. When the number of
+    buckets grows from n to n + 1, only 1 / (n + 1) of the keys move. See
+    Lamping and Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm".
+    """
+    bucket, j = -1, 0
+    while j < num_buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def get_preference(identity: str) -> str:
+    """
+    Get the preference for an identity, such as an IP address.
+    """
+    digest = _digest(identity)
+    if settings.SEARCH_PREFERENCE_BUCKETS:
+        bucket = _jump_hash(digest, settings.SEARCH_PREFERENCE_BUCKETS)
+        return f'bucket-{bucket}'
+    return f'{digest:016x}'
+
+
+def get_request_preference(request, ip: str) -> str:
+    """
+    Get the preference for a request. Authenticated clients are identified
+    by their client ID and anonymous users by their IP address.
+
+    :param request: Django's request object.
+    :param ip: The user's IP address.
+    """
+    application = getattr(request.auth, 'application', None)
+    client_id = getattr(application, 'client_id', None)
+    if client_id:
+        return get_preference(f'client:{client_id}')
+    return get_preference(f'ip:{ip}')
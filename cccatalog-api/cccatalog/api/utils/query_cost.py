@@ -0,0 +1,236 @@
+import re
+from typing import List, Tuple
+from django_redis import get_redis_connection
+"""
+Estimate how expensive a `simple_query_string` query is to run, and make
+queries that exceed a budget cheaper.
+
+The query is split into terms following the `simple_query_string` syntax.
+Each term is given a cost: plain words are cheap, while prefixes (`ne*`),
+fuzzy terms (`dog~2`) and sloppy phrases (`"red dog"~5`) expand into many
+terms in the index and cost more the more they expand. A query's cost is the
+sum of the costs of its terms, so long chains of terms add up as well.
+
+Queries over budget are rewritten by, in order, dropping fuzziness and phrase
+slop, dropping the wildcard of short prefixes, and finally dropping trailing
+terms until the query fits the budget.
+"""
+
+TERM_COST = 1
+PREFIX_COST = 5
+# Prefixes shorter than this match a large part of the term dictionary
+SHORT_PREFIX = 3
+SHORT_PREFIX_COST = 25
+# Per edit of a fuzzy term; `~` without a number allows two edits
+FUZZY_COST = 10
+DEFAULT_FUZZINESS = 2
+PHRASE_TERM_COST = 2
+PHRASE_SLOP_COST = 5
+
+STATS_PREFIX = 'query_cost:'
+METRIC_NAME = 'cccatalog_query_cost_decisions_total'
+ACCEPTED = 'accepted'
+REWRITTEN = 'rewritten'
+REJECTED = 'rejected'
+
+# A phrase, or a word, either optionally followed by a fuzziness or slop.
+_TOKEN = re.compile(
+    r'(?P<phrase>"(?:\\.|[^"\\])*")(?:~(?P<slop>\d*))?'
+    r'|(?P<word>(?:\\.|[^\s"|+()~])+)(?:~(?P<fuzziness>\d*))?'
+    r'|(?P<other>.)',
+    re.DOTALL
+)
+
+
+class Term:
+    """ A term of a query, and the text of the query it was parsed from. """
+    __slots__ = ('kind', 'text', 'param', 'raw')
+
+    def __init__(self, kind, text, param=None, raw=''):
+        # 'word', 'prefix', 'fuzzy', 'phrase' or 'operator'
+        self.kind = kind
+        self.text = text
+        # The edit distance of fuzzy terms or the slop of phrases
+        self.param = param
+        self.raw = raw
+
+    def __str__(self):
+        if self.kind == 'fuzzy':
+            return f'{self.text}~{self.param}'
+        if self.kind == 'phrase' and self.param:
+            return f'{self.text}~{self.param}'
+        if self.kind == 'prefix':
+            return f'{self.text}*'
+        if self.kind == 'operator':
+            return self.raw
+        return self.text
+
+
+def _word(word: str, raw: str) -> Term:
+    """ A word without fuzziness, which is a prefix if it ends in `*`. """
+    if word.endswith('*') and not word.endswith('\\*'):
+        return Term('prefix', word[:-1], raw=raw)
+    return Term('word', word, raw=raw)
+
+
+def parse(query: str) -> List[Term]:
+    """
+    Split a `simple_query_string` query into terms and the operators and
+    whitespace between them.
+    """
+    terms = []
+    for match in _TOKEN.finditer(query):
+        raw = match.group(0)
+        if match.group('phrase'):
+            slop = match.group('slop')
+            terms.append(Term(
+                'phrase', match.group('phrase'), int(slop) if slop else 0, raw
+            ))
+        elif match.group('word'):
+            word = match.group('word')
+            fuzziness = match.group('fuzziness')
+            if fuzziness is not None:
+                distance = int(fuzziness) if fuzziness else DEFAULT_FUZZINESS
+                terms.append(Term('fuzzy', word, distance, raw))
+            else:
+                terms.append(_word(word, raw))
+        else:
+            terms.append(Term('operator', raw, raw=raw))
+    return terms
+
+
+def strip_negations(query: str) -> str:
+    """
+    Remove the negated terms, phrases and groups from a `simple_query_string`
+    query, leaving the terms a document has to contain to match it.
+    """
+    terms = parse(query)
+    kept = []
+    idx = 0
+    while idx < len(terms):
+        term = terms[idx]
+        idx += 1
+        if term.kind == 'operator' or not term.text.startswith('-'):
+            kept.append(term)
+            continue
+        if term.text != '-':
+            # A negated word
+            continue
+        # A bare `-` negates the phrase or group that follows it.
+        if idx < len(terms) and terms[idx].kind == 'phrase':
+            idx += 1
+        elif idx < len(terms) and terms[idx].text == '(':
+            depth = 0
+            while idx < len(terms):
+                if terms[idx].kind == 'operator':
+                    if terms[idx].text == '(':
+                        depth += 1
+                    elif terms[idx].text == ')':
+                        depth -= 1
+                idx += 1
+                if not depth:
+                    break
+    return _serialize(kept)
+
+
+def term_cost(term: Term, prefix_indexed=False) -> int:
+    """
+    :param prefix_indexed: Whether prefixes are looked up in a prefix index
+    instead of being expanded.
+    """
+    if term.kind == 'word':
+        return TERM_COST
+    if term.kind == 'prefix':
+        prefix = term.text.lstrip('+-')
+        if prefix_indexed:
+            return TERM_COST
+        if len(prefix) < SHORT_PREFIX:
+            return SHORT_PREFIX_COST
+        return PREFIX_COST
+    if term.kind == 'fuzzy':
+        return FUZZY_COST * max(term.param, 1)
+    if term.kind == 'phrase':
+        words = len(term.text.split())
+        return PHRASE_TERM_COST * words + PHRASE_SLOP_COST * term.param
+    return 0
+
+
+def query_cost(terms: List[Term], prefix_indexed=False) -> int:
+    return sum(term_cost(t, prefix_indexed) for t in terms)
+
+
+def _serialize(terms: List[Term]) -> str:
+    return ''.join(str(t) for t in terms).strip()
+
+
+def limit_cost(query: str, budget: int,
+               prefix_indexed=False) -> Tuple[str, int, str]:
+    """
+    Rewrite a query to fit a cost budget.
+
+    :param query: A `simple_query_string` query.
+    :param budget: The highest acceptable cost.
+    :param prefix_indexed: Whether prefixes are looked up in a prefix index.
+    :return: The query, rewritten if it was over budget, its original cost,
+    and whether it was ACCEPTED as is, REWRITTEN, or must be REJECTED because
+    it can't be made to fit.
+    """
+    terms = parse(query)
+    cost = query_cost(terms, prefix_indexed)
+    if cost <= budget:
+        return query, cost, ACCEPTED
+    # Fuzziness and slop are the most expensive and the least useful. A
+    # fuzzy prefix such as `fi*~2` is left as the prefix `fi*`.
+    for idx, term in enumerate(terms):
+        if term.kind == 'fuzzy':
+            terms[idx] = _word(term.text, term.raw)
+        elif term.kind == 'phrase':
+            term.param = 0
+    # Short prefixes expand to a large part of the term dictionary, whether
+    # they were written as such or were left by dropping fuzziness.
+    if query_cost(terms, prefix_indexed) > budget:
+        for term in terms:
+            prefix = term.text.lstrip('+-')
+            if term.kind == 'prefix' and 0 < len(prefix) < SHORT_PREFIX:
+                term.kind = 'word'
+    # Keep as many of the leading terms as the budget allows.
+    kept = []
+    spent = 0
+    for term in terms:
+        spent += term_cost(term, prefix_indexed)
+        if spent > budget:
+            break
+        kept.append(term)
+    rewritten = _serialize(kept)
+    if not rewritten:
+        return query, cost, REJECTED
+    return rewritten, cost, REWRITTEN
+
+
+def count_decision(decision: str):
+    get_redis_connection('traffic_stats').incr(STATS_PREFIX + decision)
+
+
+def get_decision_counts() -> dict:
+    """
+    Report how many queries have been accepted, rewritten and rejected.
+    """
+    redis = get_redis_connection('traffic_stats')
+    decisions = [ACCEPTED, REWRITTEN, REJECTED]
+    counts = redis.mget([STATS_PREFIX + d for d in decisions])
+    return {
+        d: int(c) if c is not None else 0 for d, c in zip(decisions, counts)
+    }
+
+
+def render_decision_counts(counts: dict) -> str:
+    """
+    Format decision counts in the Prometheus text exposition format.
+    """
+    lines = [
+        f'# HELP {METRIC_NAME} Queries by query cost decision.',
+        f'# TYPE {METRIC_NAME} counter'
+    ]
+    for decision, count in counts.items():
+        lines.append(f'{METRIC_NAME}{{decision="{decision}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,65 @@
+import json
+import hashlib
+from elasticsearch_dsl import Search
+"""
+Produce a short, deterministic fingerprint of an Elasticsearch query. Two
+searches that will return the same results produce the same fingerprint, even
+if their filters were applied in a different order or the query text differs
+only in case and spacing.
+
+The fingerprint identifies a query in the dead link mask, the search response
+cache, and the logs.
+"""
+
+# Clauses whose order does not affect the results of a query.
+UNORDERED_CLAUSES = {'filter', 'must', 'must_not', 'should'}
+# Pagination is tracked separately from the query itself.
+PAGINATION_KEYS = ('from', 'size')
+
+
+def get_query_fingerprint(s: Search, **context) -> str:
+    """
+    Serialize a Search object to canonical JSON and hash it.
+
+    :param s: Search object to be fingerprinted.
+    :param context: Anything else that influences the results of the search
+    but is not part of the query body, such as the index or page size.
+    :return: A hex digest identifying the query.
+    """
+    serialized_search_obj = s.to_dict()
+    for key in PAGINATION_KEYS:
+        serialized_search_obj.pop(key, None)
+    canonical = _canonicalize(serialized_search_obj)
+    if context:
+        canonical = {'search': canonical, 'context': context}
+    encoded = json.dumps(
+        canonical, sort_keys=True, separators=(',', ':'), default=str
+    ).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _canonicalize(node, parent_key=None):
+    """
+    Recursively normalize a serialized query. Lists of boolean clauses and
+    `terms` values are sorted, and query strings are lowercased with
+    whitespace collapsed.
+    """
+    if isinstance(node, dict):
+        canonical = {}
+        for key, value in node.items():
+            if key == 'query' and isinstance(value, str):
+                value = ' '.join(value.lower().split())
+            elif parent_key == 'terms' and isinstance(value, list):
+                value = sorted(value, key=str)
+            canonical[key] = _canonicalize(value, key)
+        return canonical
+    elif isinstance(node, list):
+        canonical = [_canonicalize(item, parent_key) for item in node]
+        if parent_key in UNORDERED_CLAUSES:
+            canonical.sort(key=_sort_key)
+        return canonical
+    return node
+
+
+def _sort_key(node):
+    return json.dumps(node, sort_keys=True, default=str)
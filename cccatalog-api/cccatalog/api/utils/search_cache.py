@@ -0,0 +1,110 @@
+import time
+from typing import Optional, Tuple
+from django.core.cache import cache
+from django_redis import get_redis_connection
+"""
+A response-level cache for search results, stored in the `default` Redis
+cache and shared amongst all API servers in the cluster.
+
+Entries have a freshness window and a longer staleness window. Fresh entries
+are served as-is. Stale entries are still served, but the first worker to
+notice them takes a short lock and refreshes the entry in the background so
+that only one worker goes back to Elasticsearch for a popular query.
+"""
+
+# How long a cached search is served without being refreshed (in seconds)
+SEARCH_CACHE_FRESH_TTL = 60 * 2
+# How long past freshness a cached search may still be served while it is
+# being refreshed in the background
+SEARCH_CACHE_STALE_TTL = 60 * 20
+# How long a single worker may spend refreshing an entry before another
+# worker is allowed to try
+REFRESH_LOCK_TTL = 30
+
+CACHE_PREFIX = 'search_cache:'
+HITS_KEY = CACHE_PREFIX + 'hits'
+MISSES_KEY = CACHE_PREFIX + 'misses'
+STALE_HITS_KEY = CACHE_PREFIX + 'stale_hits'
+METRIC_NAME = 'cccatalog_search_cache_lookups_total'
+
+
+def get_cached_search(key: str) -> Tuple[Optional[object], bool]:
+    """
+    Look up a cached search.
+
+    :param key: The cache key of the search.
+    :return: The cached value (or None on a miss) and whether it is still
+    fresh.
+    """
+    entry = cache.get(CACHE_PREFIX + key)
+    if entry is None:
+        _count(MISSES_KEY)
+        return None, False
+    fresh = entry['fresh_until'] > time.time()
+    _count(HITS_KEY if fresh else STALE_HITS_KEY)
+    return entry['value'], fresh
+
+
+def cache_search(key: str, value):
+    """
+    Store a search in the cache, resetting its freshness window.
+    """
+    entry = {
+        'value': value,
+        'fresh_until': time.time() + SEARCH_CACHE_FRESH_TTL
+    }
+    cache.set(
+        key=CACHE_PREFIX + key,
+        value=entry,
+        timeout=SEARCH_CACHE_FRESH_TTL + SEARCH_CACHE_STALE_TTL
+    )
+
+
+def acquire_refresh_lock(key: str) -> bool:
+    """
+    Try to become the one worker responsible for refreshing a stale entry.
+
+    :return: True if the lock was acquired.
+    """
+    return cache.add(
+        key=CACHE_PREFIX + key + ':refreshing',
+        value=True,
+        timeout=REFRESH_LOCK_TTL
+    )
+
+
+def release_refresh_lock(key: str):
+    cache.delete(key=CACHE_PREFIX + key + ':refreshing')
+
+
+def get_cache_stats() -> dict:
+    """
+    Report how many cache lookups found a fresh entry, found a stale entry,
+    or missed.
+    """
+    redis = get_redis_connection('default')
+    keys = [HITS_KEY, MISSES_KEY, STALE_HITS_KEY]
+    counts = [int(c) if c is not None else 0 for c in redis.mget(keys)]
+    hits, misses, stale_hits = counts
+    return {
+        'hit': hits,
+        'stale_hit': stale_hits,
+        'miss': misses
+    }
+
+
+def render_cache_stats(stats: dict) -> str:
+    """
+    Format cache stats in the Prometheus text exposition format.
+    """
+    lines = [
+        f'# HELP {METRIC_NAME} Search cache lookups by result.',
+        f'# TYPE {METRIC_NAME} counter'
+    ]
+    for result, count in stats.items():
+        lines.append(f'{METRIC_NAME}{{result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _count(counter_key):
+    get_redis_connection('default').incr(counter_key)
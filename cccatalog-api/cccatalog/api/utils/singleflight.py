@@ -0,0 +1,126 @@
+import time
+import threading
+import logging
+from typing import Callable, Optional
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+"""
+Coalesce identical concurrent work so that it is only done once.
+
+Callers pass a key (such as a query fingerprint) and a function computing the
+result. Within a process, the first caller for a key runs the function and
+every concurrent caller with the same key waits for its result. Across
+processes, the first caller takes a short lease in Redis and hands its result
+to callers in other processes, which poll for it instead of repeating the
+work. Handed-off results are tagged with the lease they were computed under,
+and callers only accept a result from the lease they waited on, so a caller
+that arrives after the work is done computes it afresh: this is not a cache.
+If the lease holder fails or takes too long, waiting callers fall back to
+doing the work themselves.
+"""
+
+log = logging.getLogger(__name__)
+
+LEASE_PREFIX = 'singleflight:'
+RESULT_PREFIX = 'singleflight_result:'
+# How long a process may hold the lease for a key (in seconds)
+LEASE_TTL = 10
+# How often callers in other processes check for the published result
+POLL_INTERVAL = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def do(key: str, compute: Callable, encode: Optional[Callable] = None,
+       decode: Optional[Callable] = None):
+    """
+    Compute a result once for all concurrent callers with the same key.
+
+    :param key: Identifies the work to be done.
+    :param compute: Computes the result.
+    :param encode: Converts a result to something that can be pickled into
+    Redis. Without it, work is only coalesced within this process.
+    :param decode: Reverses `encode`.
+    :return: The result of `compute`.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _calls[key] = call
+    if not leader:
+        if call.done.wait(LEASE_TTL):
+            if call.error is not None:
+                raise call.error
+            return call.result
+        return compute()
+    try:
+        call.result = _do_across_processes(key, compute, encode, decode)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def _do_across_processes(key, compute, encode, decode):
+    if encode is None:
+        return compute()
+    redis = get_redis_connection('default')
+    lease = redis.lock(LEASE_PREFIX + key, timeout=LEASE_TTL)
+    if lease.acquire(blocking=False):
+        token = lease.local.token
+        # Whatever the previous lease holder handed off is stale now.
+        cache.delete(RESULT_PREFIX + key)
+        try:
+            result = compute()
+            cache.set(
+                RESULT_PREFIX + key, (token, encode(result)),
+                timeout=LEASE_TTL
+            )
+            return result
+        finally:
+            try:
+                lease.release()
+            except LockError:
+                pass
+    # Another process is doing the work; wait for it to hand over the result.
+    token = redis.get(LEASE_PREFIX + key)
+    deadline = time.time() + LEASE_TTL
+    while token is not None and time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        result = _get_handed_off(key, token, decode)
+        if result is not None:
+            return result
+        if redis.get(LEASE_PREFIX + key) != token:
+            # Released or expired; the result may have landed just before.
+            result = _get_handed_off(key, token, decode)
+            if result is not None:
+                return result
+            break
+    log.info('Coalesced search was not handed off; computing it instead.')
+    return compute()
+
+
+def _get_handed_off(key, token, decode):
+    """
+    Get the result handed off under the lease `token`, if there is one.
+    """
+    handed_off = cache.get(RESULT_PREFIX + key)
+    if handed_off is None or handed_off[0] != token:
+        return None
+    return decode(handed_off[1])
@@ -11,7 +11,29 @@ def _from_internal_network(ip):
     return redis.sismember('ip-whitelist', ip)
 
 
-class AnonRateThrottle(SimpleRateThrottle):
+class WeightedRateThrottle(SimpleRateThrottle):
+    """
+    A rate throttle where a single request may count as several. Views that
+    do more than one request's worth of work define
+    `get_throttle_weight(request)`; every other request counts once.
+    """
+    weight = 1
+
+    def allow_request(self, request, view):
+        get_throttle_weight = getattr(view, 'get_throttle_weight', None)
+        self.weight = get_throttle_weight(request) \
+            if get_throttle_weight else 1
+        return super().allow_request(request, view)
+
+    def throttle_success(self):
+        if len(self.history) + self.weight > self.num_requests:
+            return self.throttle_failure()
+        self.history[:0] = [self.now] * self.weight
+        self.cache.set(self.key, self.history, self.duration)
+        return True
+
+
+class AnonRateThrottle(WeightedRateThrottle):
     """
     Limits the rate of API calls that may be made by a anonymous users.
 
@@ -58,7 +80,7 @@ class OnePerSecond(AnonRateThrottle):
     rate = '1/second'
 
 
-class OAuth2IdThrottleRate(SimpleRateThrottle):
+class OAuth2IdThrottleRate(WeightedRateThrottle):
     """
     Limits the rate of API calls that may be made by a given user's Oauth2
     client ID. Can be configured to apply to either standard or enhanced
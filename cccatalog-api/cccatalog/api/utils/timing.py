@@ -0,0 +1,182 @@
+import threading
+import time
+from typing import Dict
+from django_redis import get_redis_connection
+"""
+Record how long each stage of a request takes.
+
+Code that does something worth measuring wraps it in `stage(name)`. The
+durations are collected per request by `ServerTimingMiddleware`, returned to
+the client in a `Server-Timing` header, and added to per-stage histograms in
+the `traffic_stats` Redis cache, which are shared by every worker and can be
+scraped in the Prometheus text format.
+
+Timing only happens while a request is being timed. When the middleware is
+disabled, `stage` returns a shared no-op context manager.
+"""
+
+# Upper bounds of the histogram buckets (in milliseconds)
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+HISTOGRAM_PREFIX = 'stage_timing:'
+STAGES_KEY = HISTOGRAM_PREFIX + 'stages'
+METRIC_NAME = 'cccatalog_stage_duration_ms'
+
+# Greenlet-local when gevent has patched the threading module.
+_local = threading.local()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'timings', 'start')
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.append((self.name, time.perf_counter() - self.start))
+        return False
+
+
+def start_request():
+    """ Start collecting stage timings for the current request. """
+    _local.timings = []
+
+
+def finish_request() -> Dict[str, float]:
+    """
+    Stop collecting stage timings for the current request.
+
+    :return: The total duration of each stage in milliseconds, in the order
+    the stages first ran.
+    """
+    timings = getattr(_local, 'timings', None)
+    _local.timings = None
+    totals = {}
+    for name, seconds in timings or []:
+        totals[name] = totals.get(name, 0) + seconds * 1000
+    return totals
+
+
+def stage(name):
+    """
+    Time a block of code as a stage of the current request. Stages that run
+    more than once in a request are added up.
+
+    :param name: The name of the stage, e.g. 'es'.
+    """
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        return _NULL_STAGE
+    return _Stage(name, timings)
+
+
+def server_timing_header(totals: Dict[str, float]) -> str:
+    return ', '.join(f'{name};dur={ms:.1f}' for name, ms in totals.items())
+
+
+def _bucket(ms):
+    for bound in BUCKETS_MS:
+        if ms <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+def record_histograms(totals: Dict[str, float]):
+    """
+    Add the stage timings of a request to the shared histograms.
+    """
+    pipe = get_redis_connection('traffic_stats').pipeline(transaction=False)
+    for name, ms in totals.items():
+        key = HISTOGRAM_PREFIX + name
+        pipe.sadd(STAGES_KEY, name)
+        pipe.hincrby(key, _bucket(ms), 1)
+        pipe.hincrby(key, 'count', 1)
+        pipe.hincrbyfloat(key, 'sum', ms)
+    pipe.execute()
+
+
+def get_histograms() -> Dict[str, dict]:
+    """
+    Read the shared histograms.
+
+    :return: For each stage, the cumulative count of requests per bucket
+    upper bound, the total count, and the sum of durations.
+    """
+    redis = get_redis_connection('traffic_stats')
+    stages = sorted(s.decode('utf-8') for s in redis.smembers(STAGES_KEY))
+    pipe = redis.pipeline(transaction=False)
+    for name in stages:
+        pipe.hgetall(HISTOGRAM_PREFIX + name)
+    histograms = {}
+    for name, raw in zip(stages, pipe.execute()):
+        raw = {k.decode('utf-8'): v for k, v in raw.items()}
+        buckets = []
+        cumulative = 0
+        for bound in [str(b) for b in BUCKETS_MS] + ['+Inf']:
+            cumulative += int(raw.get(bound, 0))
+            buckets.append((bound, cumulative))
+        histograms[name] = {
+            'buckets': buckets,
+            'count': int(raw.get('count', 0)),
+            'sum': float(raw.get('sum', 0))
+        }
+    return histograms
+
+
+def render_histograms(histograms: Dict[str, dict]) -> str:
+    """
+    Format histograms in the Prometheus text exposition format.
+    """
+    lines = [
+        f'# HELP {METRIC_NAME} Time spent in each stage of a request.',
+        f'# TYPE {METRIC_NAME} histogram'
+    ]
+    for name, histogram in histograms.items():
+        for bound, count in histogram['buckets']:
+            lines.append(
+                f'{METRIC_NAME}_bucket{{stage="{name}",le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'{METRIC_NAME}_sum{{stage="{name}"}} {histogram["sum"]}'
+        )
+        lines.append(
+            f'{METRIC_NAME}_count{{stage="{name}"}} {histogram["count"]}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class ServerTimingMiddleware:
+    """
+    Time every request, and report the stages of requests that recorded any
+    in a `Server-Timing` header and the shared histograms.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            totals = finish_request()
+        if totals:
+            totals['total'] = (time.perf_counter() - start) * 1000
+            response['Server-Timing'] = server_timing_header(totals)
+            record_histograms(totals)
+        return response
@@ -2,27 +2,35 @@ import time
 import grequests
 import logging
 from django_redis import get_redis_connection
-from cccatalog.api.utils.dead_link_mask import get_query_mask, save_query_mask
+from cccatalog.api.utils.dead_link_mask import save_query_mask, \
+    record_dead_link_stats
 
 log = logging.getLogger(__name__)
 
+CACHE_PREFIX = 'valid:'
 
-def validate_images(query_hash, start_slice, results, image_urls):
+
+def validate_images(query_hash, start_slice, results, image_urls,
+                    defer=False):
     """
     Make sure images exist before we display them. Treat redirects as broken
     links since 99% of the time the redirect leads to a generic "not found"
     placeholder.
 
     Results are cached in redis and shared amongst all API servers in the
-    cluster.
+    cluster. If `query_hash` is None, the query's dead link mask is left
+    untouched.
+
+    If `defer` is set, links that aren't cached yet are assumed to be alive
+    and are queued for the background validator instead of being checked
+    while the user waits. See `cccatalog.api.utils.background_validator`.
     """
     if not image_urls:
         return
     start_time = time.time()
     # Pull matching images from the cache.
     redis = get_redis_connection("default")
-    cache_prefix = 'valid:'
-    cached_statuses = redis.mget([cache_prefix + url for url in image_urls])
+    cached_statuses = redis.mget([CACHE_PREFIX + url for url in image_urls])
     cached_statuses = [
         int(b.decode('utf-8'))
         if b is not None else None for b in cached_statuses
@@ -32,45 +40,33 @@ def validate_images(query_hash, start_slice, results, image_urls):
     for idx, url in enumerate(image_urls):
         if cached_statuses[idx] is None:
             to_verify[url] = idx
-    reqs = (
-        grequests.head(u, allow_redirects=False, timeout=2, verify=False)
-        for u in to_verify.keys()
-    )
-    verified = grequests.map(reqs, exception_handler=_validation_failure)
-    # Cache newly verified image statuses.
-    to_cache = {}
-    for idx, url in enumerate(to_verify.keys()):
-        cache_key = cache_prefix + url
-        if verified[idx]:
-            status = verified[idx].status_code
-        # Response didn't arrive in time. Try again later.
-        else:
-            status = -1
-        to_cache[cache_key] = status
+    if defer:
+        # Imported here to avoid a circular import.
+        from cccatalog.api.utils.background_validator import \
+            enqueue_validation
+        enqueue_validation([
+            (url, getattr(results[idx], 'source', 'unknown'),
+             query_hash, start_slice + idx)
+            for url, idx in to_verify.items()
+        ])
+        for idx in to_verify.values():
+            cached_statuses[idx] = 200
+        to_verify = {}
+    verified = verify_image_urls(list(to_verify.keys()))
+    cache_image_statuses(dict(zip(to_verify.keys(), verified)))
 
-    thirty_minutes = 60 * 30
-    twenty_four_hours_seconds = 60 * 60 * 24
-    pipe = redis.pipeline()
-    if len(to_cache) > 0:
-        pipe.mset(to_cache)
-    for key, status in to_cache.items():
-        # Cache successful links for a day, and broken links for 120 days.
-        if status == 200:
-            pipe.expire(key, twenty_four_hours_seconds)
-        elif status == -1:
-            # Content provider failed to respond; try again in a short interval
-            pipe.expire(key, thirty_minutes)
-        else:
-            pipe.expire(key, twenty_four_hours_seconds * 120)
-    pipe.execute()
-
-    # Merge newly verified results with cached statuses
+    # Merge newly verified results with cached statuses, and keep track of
+    # how often each source serves dead links.
+    source_counts = {}
     for idx, url in enumerate(to_verify):
         cache_idx = to_verify[url]
-        if verified[idx] is not None:
-            cached_statuses[cache_idx] = verified[idx].status_code
-        else:
-            cached_statuses[cache_idx] = -1
+        cached_statuses[cache_idx] = verified[idx]
+        source = getattr(results[cache_idx], 'source', 'unknown')
+        validated, dead = source_counts.get(source, (0, 0))
+        if is_dead(cached_statuses[cache_idx]):
+            dead += 1
+        source_counts[source] = (validated + 1, dead)
+    record_dead_link_stats(source_counts)
 
     # Create a new dead link mask
     new_mask = [1] * len(results)
@@ -83,7 +79,7 @@ def validate_images(query_hash, start_slice, results, image_urls):
                 'Image validation failed due to rate limiting or blocking. '
                 'Affected URL: {}'.format(image_urls[idx])
             )
-        elif status != 200:
+        elif is_dead(status):
             log.info(
                 'Deleting broken image with ID {} from results.'
                 .format(results[del_idx]['identifier'])
@@ -92,14 +88,62 @@ def validate_images(query_hash, start_slice, results, image_urls):
             new_mask[del_idx] = 0
 
     # Merge and cache the new mask
-    mask = get_query_mask(query_hash)
-    if mask:
-        new_mask = mask[:start_slice] + new_mask
-    save_query_mask(query_hash, new_mask)
+    if query_hash is not None:
+        save_query_mask(query_hash, new_mask, start=start_slice)
 
     end_time = time.time()
     log.info('Validated images in {} '.format(end_time - start_time))
 
 
+def verify_image_urls(image_urls):
+    """
+    Send a HEAD request to each image URL in parallel.
+
+    :return: The status code of each URL, or -1 if the request failed.
+    """
+    reqs = (
+        grequests.head(u, allow_redirects=False, timeout=2, verify=False)
+        for u in image_urls
+    )
+    verified = grequests.map(reqs, exception_handler=_validation_failure)
+    # Failed or timed out requests are retried after a short interval.
+    return [
+        resp.status_code if resp is not None else -1 for resp in verified
+    ]
+
+
+def cache_image_statuses(statuses):
+    """
+    Cache the status codes of newly verified images.
+
+    :param statuses: Maps each image URL to its status code.
+    """
+    if not statuses:
+        return
+    to_cache = {CACHE_PREFIX + url: status for url, status in statuses.items()}
+    thirty_minutes = 60 * 30
+    twenty_four_hours_seconds = 60 * 60 * 24
+    pipe = get_redis_connection("default").pipeline()
+    pipe.mset(to_cache)
+    for key, status in to_cache.items():
+        # Cache successful links for a day, and broken links for 120 days.
+        if status == 200:
+            pipe.expire(key, twenty_four_hours_seconds)
+        elif status == -1:
+            # Content provider failed to respond; try again in a short interval
+            pipe.expire(key, thirty_minutes)
+        else:
+            pipe.expire(key, twenty_four_hours_seconds * 120)
+    pipe.execute()
+
+
+def is_dead(status):
+    """
+    Rate limited or blocked requests don't tell us whether the image exists,
+    so only other failures count as dead links.
+    """
+    return status not in (200, 403, 429)
+
+
 def _validation_failure(request, exception):
     log.warning('Failed to validate image! Reason: {}'.format(exception))
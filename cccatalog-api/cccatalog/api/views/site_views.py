@@ -24,6 +24,13 @@ from cccatalog.api.utils.throttle import (
     TenPerDay, OnePerSecond, OneThousandPerMinute
 )
 from cccatalog.api.utils.oauth2_helper import get_token_info
+from cccatalog.api.utils.timing import get_histograms, render_histograms
+from cccatalog.api.utils.query_cost import get_decision_counts, \
+    render_decision_counts
+from cccatalog.api.utils.background_validator import get_validator_stats, \
+    render_validator_stats
+from cccatalog.api.utils.search_cache import get_cache_stats, \
+    render_cache_stats
 from cccatalog.settings import THUMBNAIL_PROXY_URL, THUMBNAIL_WIDTH_PX
 from django.core.cache import cache
 from django.http import HttpResponse
@@ -54,6 +61,62 @@ class HealthCheck(APIView):
         return Response('', status=200)
 
 
+class SearchTimingMetrics(APIView):
+    """
+    Returns the per-stage request timing histograms in the Prometheus text
+    format. Timing is only recorded when `SEARCH_TIMING` is enabled.
+    """
+    swagger_schema = None
+
+    def get(self, request, format=None):
+        return HttpResponse(
+            render_histograms(get_histograms()),
+            content_type='text/plain; version=0.0.4'
+        )
+
+
+class QueryCostMetrics(APIView):
+    """
+    Returns how many queries were accepted, rewritten to a cheaper form or
+    rejected for exceeding `QUERY_COST_BUDGET`, in the Prometheus text format.
+    """
+    swagger_schema = None
+
+    def get(self, request, format=None):
+        return HttpResponse(
+            render_decision_counts(get_decision_counts()),
+            content_type='text/plain; version=0.0.4'
+        )
+
+
+class SearchCacheMetrics(APIView):
+    """
+    Returns how many searches were served fresh or stale from the search
+    cache, or missed it, in the Prometheus text format.
+    """
+    swagger_schema = None
+
+    def get(self, request, format=None):
+        return HttpResponse(
+            render_cache_stats(get_cache_stats()),
+            content_type='text/plain; version=0.0.4'
+        )
+
+
+class ValidationMetrics(APIView):
+    """
+    Returns the depth of the background link validation queue and how far
+    behind the validators are, in the Prometheus text format.
+    """
+    swagger_schema = None
+
+    def get(self, request, format=None):
+        return HttpResponse(
+            render_validator_stats(get_validator_stats()),
+            content_type='text/plain; version=0.0.4'
+        )
+
+
 class AboutImageResponse(serializers.Serializer):
     """ The full image search response. """
     source_name = serializers.CharField(
@@ -9,8 +9,10 @@ register_api_oauth2_201_example = {
 image_search_200_example = {
     "application/json": {
         "result_count": 77,
+        "result_count_lower_bound": False,
         "page_count": 77,
         "page_size": 1,
+        "next_cursor": "eyJzZWFyY2hfYWZ0ZXIiOlsxLjAsNDI2MzE4XX0=",
         "results": [
             {
                 "title": "File:Well test separator.svg",
@@ -46,6 +48,44 @@ image_search_400_example = {
     }
 }
 
+image_facets_200_example = {
+    "application/json": {
+        "facets": {
+            "license": [
+                {"value": "by", "count": 1204},
+                {"value": "cc0", "count": 310}
+            ],
+            "license_type": [
+                {"value": "all", "count": 1514},
+                {"value": "all-cc", "count": 1514},
+                {"value": "commercial", "count": 1514},
+                {"value": "modification", "count": 1514}
+            ],
+            "source": [
+                {"value": "flickr", "count": 1402},
+                {"value": "met", "count": 112}
+            ],
+            "extension": [
+                {"value": "jpg", "count": 1490},
+                {"value": "png", "count": 24}
+            ],
+            "categories": [
+                {"value": "photograph", "count": 1402}
+            ],
+            "aspect_ratio": [
+                {"value": "wide", "count": 980},
+                {"value": "tall", "count": 420},
+                {"value": "square", "count": 114}
+            ],
+            "size": [
+                {"value": "large", "count": 1011},
+                {"value": "medium", "count": 403},
+                {"value": "small", "count": 100}
+            ]
+        }
+    }
+}
+
 image_detail_200_example = {
     "application/json": {
         "title": "exam test",
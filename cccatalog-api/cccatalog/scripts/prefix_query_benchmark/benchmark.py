@@ -0,0 +1,111 @@
+"""
+Compare the latency of trailing wildcard queries (`q=net*`) expanded against
+the term dictionary of `title` and `tags.name` with the rewritten `prefix`
+queries served from an `index_prefixes` index.
+
+Generates a corpus of random titles and tags into two throwaway indices, one
+mapped without a prefix index and one with it, and deletes them afterwards.
+
+Requires a running Elasticsearch. Run from the `cccatalog-api` directory:
+    PYTHONPATH=. DJANGO_SETTINGS_MODULE=cccatalog.settings python cccatalog/scripts/prefix_query_benchmark/benchmark.py
+"""  # noqa
+import os
+import random
+import statistics
+import time
+import django
+django.setup()
+from elasticsearch import helpers
+from elasticsearch_dsl import Search
+from cccatalog.api.controllers import search_controller
+
+CORPUS_SIZE = 500000
+ROUNDS = 5
+PREFIXES = ['a', 'ne', 'net', 'pho', 'sun', 'wat', 'b', 'tr', 'mou', 'cit']
+FIELDS = ['tags.name', 'title']
+WORDS_FILE = os.path.join(
+    os.path.dirname(__file__), '..', 'api_load_testing',
+    'common_english_words.txt'
+)
+PREFIX_INDEX = {'min_chars': 1, 'max_chars': 10}
+
+
+def mapping(prefixed):
+    text = {'type': 'text'}
+    if prefixed:
+        text['index_prefixes'] = PREFIX_INDEX
+    return {
+        'settings': {'index': {'number_of_shards': 1,
+                               'number_of_replicas': 0}},
+        'mappings': {
+            'properties': {
+                'title': text,
+                'tags': {'properties': {'name': text}}
+            }
+        }
+    }
+
+
+def generate_documents(words):
+    # Suffixes blow up the term dictionary the way user-supplied titles and
+    # tags do.
+    rng = random.Random(0)
+    for _ in range(CORPUS_SIZE):
+        def word():
+            return rng.choice(words) + str(rng.randint(0, 999))
+        yield {
+            'title': ' '.join(word() for _ in range(rng.randint(2, 6))),
+            'tags': [{'name': word()} for _ in range(rng.randint(1, 8))]
+        }
+
+
+def create_index(es, name, prefixed, words):
+    es.indices.delete(index=name, ignore=[404])
+    es.indices.create(index=name, body=mapping(prefixed))
+    actions = ({'_index': name, '_source': doc}
+               for doc in generate_documents(words))
+    helpers.bulk(es, actions, chunk_size=5000)
+    es.indices.refresh(index=name)
+    es.indices.forcemerge(index=name, max_num_segments=1)
+
+
+def time_queries(es, index, build_query):
+    timings = []
+    for _ in range(ROUNDS):
+        for prefix in PREFIXES:
+            s = Search(using=es, index=index).query(build_query(prefix))
+            s = s.params(request_cache=False)[0:20]
+            start = time.perf_counter()
+            s.execute()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == '__main__':
+    es = search_controller.es
+    with open(WORDS_FILE) as f:
+        words = f.read().split()
+    before_index = 'prefix-benchmark-before'
+    after_index = 'prefix-benchmark-after'
+    create_index(es, before_index, False, words)
+    create_index(es, after_index, True, words)
+    try:
+        cases = [
+            ('term dictionary expansion', before_index, lambda p: {
+                'simple_query_string': {'query': p + '*', 'fields': FIELDS}
+            }),
+            ('prefix index', after_index, lambda p: search_controller
+                ._text_query(p + '*', FIELDS))
+        ]
+        for name, index, build_query in cases:
+            # Warm up.
+            time_queries(es, index, build_query)
+            timings = sorted(time_queries(es, index, build_query))
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(
+                f'{name}: median {statistics.median(timings):.1f}ms, '
+                f'p95 {p95:.1f}ms over {len(timings)} queries'
+            )
+    finally:
+        es.indices.delete(index=before_index, ignore=[404])
+        es.indices.delete(index=after_index, ignore=[404])
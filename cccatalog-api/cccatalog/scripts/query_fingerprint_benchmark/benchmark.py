@@ -0,0 +1,60 @@
+"""
+Compare the cost of identifying a query with DeepHash (the previous approach)
+against the canonical JSON fingerprint in
+`cccatalog.api.utils.query_fingerprint`.
+
+Run from the `cccatalog-api` directory:
+    PYTHONPATH=. python cccatalog/scripts/query_fingerprint_benchmark/benchmark.py
+"""  # noqa
+import timeit
+from deepdiff import DeepHash
+from elasticsearch_dsl import Q, Search
+from cccatalog.api.utils.query_fingerprint import get_query_fingerprint
+
+ITERATIONS = 2000
+
+
+def representative_search():
+    """ A filtered, boosted and highlighted query like the ones we serve. """
+    s = Search(index='image')
+    for field, values in [('license__keyword', ['by', 'by-sa', 'cc0']),
+                          ('extension', ['jpg', 'png']),
+                          ('categories', ['photograph'])]:
+        s = s.filter(
+            'bool', should=[Q('term', **{field: v}) for v in values]
+        )
+    s = s.exclude('term', mature=True)
+    s = s.exclude('terms', provider=['a', 'b', 'c'])
+    s = s.query(
+        'simple_query_string',
+        query='dog cat',
+        fields=['tags.name', 'title', 'description'],
+        default_operator='AND'
+    )
+    s = Search().query(Q(
+        'bool',
+        must=s.query,
+        should=[
+            Q('simple_query_string', fields=['title'], query='"dog cat"',
+              boost=10000),
+            Q('rank_feature', field='standardized_popularity', boost=10000)
+        ]
+    ))
+    s = s.highlight('tags.name', 'title', 'description')
+    return s.sort('_score', {'id': 'desc'})[0:40]
+
+
+def deep_hash(s):
+    serialized_search_obj = s.to_dict()
+    serialized_search_obj.pop('from', None)
+    serialized_search_obj.pop('size', None)
+    return DeepHash(serialized_search_obj)[serialized_search_obj]
+
+
+if __name__ == '__main__':
+    s = representative_search()
+    for name, func in [('DeepHash', deep_hash),
+                       ('fingerprint', get_query_fingerprint)]:
+        elapsed = timeit.timeit(lambda: func(s), number=ITERATIONS)
+        per_call_us = elapsed / ITERATIONS * 1e6
+        print(f'{name}: {per_call_us:.1f}us per query')
@@ -0,0 +1,66 @@
+"""
+Measure the latency of the `RelatedImage` view when the image's document ID
+has to be looked up in Elasticsearch (two queries per request) against when
+it is already cached (a single `more_like_this` query).
+
+Requires a running API stack with data loaded. Run from the `cccatalog-api`
+directory:
+    PYTHONPATH=. DJANGO_SETTINGS_MODULE=cccatalog.settings python cccatalog/scripts/related_images_benchmark/benchmark.py
+"""  # noqa
+import time
+import statistics
+import django
+django.setup()
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory
+from cccatalog.api.controllers import search_controller
+from cccatalog.api.views.image_views import RelatedImage
+
+SAMPLE_SIZE = 50
+ROUNDS = 5
+
+
+def sample_identifiers():
+    response = search_controller.es.search(
+        index='image', body={'size': SAMPLE_SIZE, '_source': ['identifier']}
+    )
+    return [hit['_source']['identifier'] for hit in response['hits']['hits']]
+
+
+def forget_document_ids(identifiers):
+    search_controller.get_document_id.cache_clear()
+    cache.delete_many([
+        f'{prefix}:image:{uuid}'
+        for prefix in ('doc_id', 'related') for uuid in identifiers
+    ])
+
+
+def time_view(view, factory, identifiers, cold):
+    timings = []
+    for uuid in identifiers:
+        if cold:
+            forget_document_ids([uuid])
+        request = factory.get(f'/v1/recommendations/images/{uuid}')
+        start = time.perf_counter()
+        view(request, identifier=uuid)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == '__main__':
+    identifiers = sample_identifiers()
+    factory = APIRequestFactory()
+    view = RelatedImage.as_view()
+    # Warm up connections and the validation cache.
+    time_view(view, factory, identifiers, cold=False)
+    for name, cold in [('uncached document ID', True),
+                       ('cached document ID', False)]:
+        timings = []
+        for _ in range(ROUNDS):
+            timings += time_view(view, factory, identifiers, cold)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(
+            f'{name}: median {statistics.median(timings):.1f}ms, '
+            f'p95 {p95:.1f}ms over {len(timings)} requests'
+        )
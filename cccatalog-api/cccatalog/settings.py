@@ -321,3 +321,63 @@ VERBOSE_ES_RESPONSE = os.getenv('DEBUG_SCORES', 'False') in true_strings
 
 # Whether to boost results by authority and popularity
 USE_RANK_FEATURES = os.getenv('USE_RANK_FEATURES', 'True') in true_strings
+# How much each rank feature is boosted by. 0 disables a feature.
+POPULARITY_BOOST = float(os.getenv('POPULARITY_BOOST', 10000))
+AUTHORITY_BOOST = float(os.getenv('AUTHORITY_BOOST', 0))
+# Either 'query' to score rank features for every match, or 'rescore' to only
+# score them for the top RESCORE_WINDOW_SIZE hits of each shard. Rescored
+# searches can't be paginated with cursors.
+RANKING_MODE = os.getenv('RANKING_MODE', 'query')
+RESCORE_WINDOW_SIZE = int(os.getenv('RESCORE_WINDOW_SIZE', 500))
+
+# Pin cursor pagination to an Elasticsearch point in time (requires 7.10+).
+# A point in time is opened when a walk starts with `cursor=start` and closed
+# when it reaches the end; abandoned walks expire after the keep alive.
+USE_POINT_IN_TIME = os.getenv('USE_POINT_IN_TIME', 'False') in true_strings
+POINT_IN_TIME_KEEP_ALIVE = os.getenv('POINT_IN_TIME_KEEP_ALIVE', '5m')
+
+# Serve repeated searches from a shared response cache
+USE_SEARCH_CACHE = os.getenv('USE_SEARCH_CACHE', 'True') in true_strings
+
+# Validate unchecked links in the background instead of during the request
+DEFER_LINK_VALIDATION = \
+    os.getenv('DEFER_LINK_VALIDATION', 'False') in true_strings
+
+# How many requests `manage.py serve_concurrent` handles at once, and how many
+# connections to Elasticsearch are kept open for them
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', 500))
+ELASTICSEARCH_MAX_CONNECTIONS = \
+    int(os.getenv('ELASTICSEARCH_MAX_CONNECTIONS', 100))
+
+# Execute identical concurrent searches only once, across all workers
+USE_SINGLEFLIGHT = os.getenv('USE_SINGLEFLIGHT', 'True') in true_strings
+
+# Time each stage of search requests, report it in a `Server-Timing` header and
+# aggregate it into histograms served at /metrics/search_timing
+SEARCH_TIMING = os.getenv('SEARCH_TIMING', 'False') in true_strings
+if SEARCH_TIMING:
+    MIDDLEWARE.insert(0, 'cccatalog.api.utils.timing.ServerTimingMiddleware')
+
+# Number of groups of users that share Elasticsearch shard copies. 0 gives
+# every user their own preference.
+SEARCH_PREFERENCE_BUCKETS = int(os.getenv('SEARCH_PREFERENCE_BUCKETS', 32))
+
+# Queries estimated to cost more than this (see `utils.query_cost`) are either
+# rewritten to a cheaper form ('rewrite') or rejected ('reject')
+QUERY_COST_BUDGET = int(os.getenv('QUERY_COST_BUDGET', 50))
+QUERY_COST_ACTION = os.getenv('QUERY_COST_ACTION', 'rewrite')
+
+# Shed low priority searches, and then all of them, with a 503 while
+# Elasticsearch's 90th percentile latency exceeds these thresholds (in
+# milliseconds) or its error rate is high. See `utils.circuit_breaker`.
+USE_CIRCUIT_BREAKER = os.getenv('USE_CIRCUIT_BREAKER', 'True') in true_strings
+CIRCUIT_BREAKER_SHED_LATENCY_MS = \
+    int(os.getenv('CIRCUIT_BREAKER_SHED_LATENCY_MS', 2000))
+CIRCUIT_BREAKER_OPEN_LATENCY_MS = \
+    int(os.getenv('CIRCUIT_BREAKER_OPEN_LATENCY_MS', 5000))
+
+# Send a duplicate of searches and related image lookups that haven't answered
+# within the rolling 95th percentile latency to other shard copies, for at
+# most HEDGE_RATE of them. See `utils.hedging`.
+USE_HEDGED_REQUESTS = os.getenv('USE_HEDGED_REQUESTS', 'False') in true_strings
+HEDGE_RATE = float(os.getenv('HEDGE_RATE', 0.05))
@@ -17,9 +17,11 @@ from django.contrib import admin
 from django.urls import path, re_path
 from django.conf.urls import include
 from cccatalog.api.views.image_views import SearchImages, ImageDetail,\
-    Watermark, RelatedImage, OembedView, ReportImageView
+    Watermark, RelatedImage, OembedView, ReportImageView, BatchSearchImages, \
+    ImageFacets
 from cccatalog.api.views.site_views import HealthCheck, ImageStats, Register, \
-    CheckRates, VerifyEmail, ProxiedImage
+    CheckRates, VerifyEmail, ProxiedImage, SearchTimingMetrics, \
+    QueryCostMetrics, ValidationMetrics, SearchCacheMetrics
 from cccatalog.api.views.link_views import CreateShortenedLink, \
     ResolveShortenedLink
 from cccatalog.settings import API_VERSION, WATERMARK_ENABLED
@@ -256,6 +258,12 @@ versioned_paths = [
         r'auth_tokens/',
         include('oauth2_provider.urls', namespace='oauth2_provider')
     ),
+    path(
+        'images/batch_search',
+        BatchSearchImages.as_view(),
+        name='images-batch-search'
+    ),
+    path('images/facets', ImageFacets.as_view(), name='images-facets'),
     path(
         'images/<str:identifier>', ImageDetail.as_view(), name='image-detail'
     ),
@@ -289,6 +297,10 @@ urlpatterns = [
     path('', RedirectView.as_view(url='/v1')),
     path('admin/', admin.site.urls),
     re_path('healthcheck', HealthCheck.as_view()),
+    path('metrics/search_timing', SearchTimingMetrics.as_view()),
+    path('metrics/query_cost', QueryCostMetrics.as_view()),
+    path('metrics/validation', ValidationMetrics.as_view()),
+    path('metrics/search_cache', SearchCacheMetrics.as_view()),
     re_path(
         r'^swagger(?P<format>\.json|\.yaml)$',
         schema_view.without_ui(cache_timeout=None), name='schema-json'
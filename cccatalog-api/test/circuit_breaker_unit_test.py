@@ -0,0 +1,177 @@
+import time
+import pytest
+from math import ceil
+from elasticsearch import RequestsHttpConnection
+from elasticsearch.exceptions import TransportError
+from cccatalog import settings
+from cccatalog.api.utils import circuit_breaker
+from cccatalog.api.utils.circuit_breaker import CircuitBreaker, \
+    BreakerConnection, Overloaded, CLOSED, SHEDDING, OPEN, HALF_OPEN, HIGH, \
+    LOW
+
+"""
+Unit tests for the Elasticsearch circuit breaker. The breaker's clock is
+replaced so that windows, cooldowns and re-evaluation are deterministic.
+"""
+
+HEALTHY = 10
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(time, 'monotonic', clock)
+    monkeypatch.setattr(settings, 'USE_CIRCUIT_BREAKER', True, raising=False)
+    monkeypatch.setattr(
+        settings, 'CIRCUIT_BREAKER_SHED_LATENCY_MS', 2000, raising=False
+    )
+    monkeypatch.setattr(
+        settings, 'CIRCUIT_BREAKER_OPEN_LATENCY_MS', 5000, raising=False
+    )
+    return clock
+
+
+@pytest.fixture
+def probe_all(monkeypatch):
+    """ Let every high priority request through while half open. """
+    monkeypatch.setattr(circuit_breaker.random, 'random', lambda: 0)
+
+
+def _record(breaker, count, latency_ms=HEALTHY, failed=False):
+    for _ in range(count):
+        breaker.record(latency_ms, failed)
+
+
+def _state(breaker, clock):
+    clock.advance(circuit_breaker.EVALUATE_INTERVAL)
+    return breaker.state()
+
+
+def _open(breaker, clock):
+    _record(breaker, circuit_breaker.MIN_REQUESTS, failed=True)
+    assert _state(breaker, clock) == OPEN
+    clock.advance(circuit_breaker.COOLDOWN)
+    assert _state(breaker, clock) == HALF_OPEN
+
+
+def test_too_few_requests_are_not_judged(clock):
+    breaker = CircuitBreaker()
+    _record(breaker, circuit_breaker.MIN_REQUESTS - 1, failed=True)
+    assert _state(breaker, clock) == CLOSED
+
+
+def test_slow_requests_shed_low_priority_work(clock):
+    breaker = CircuitBreaker()
+    _record(breaker, circuit_breaker.MIN_REQUESTS, latency_ms=3000)
+    assert _state(breaker, clock) == SHEDDING
+    assert breaker.should_shed()
+    breaker.admit(HIGH)
+    with pytest.raises(Overloaded) as e:
+        breaker.admit(LOW)
+    assert e.value.wait == circuit_breaker.SHED_RETRY_AFTER
+
+
+def test_failing_requests_open_the_breaker(clock):
+    breaker = CircuitBreaker()
+    _record(breaker, circuit_breaker.MIN_REQUESTS, failed=True)
+    assert _state(breaker, clock) == OPEN
+    with pytest.raises(Overloaded) as e:
+        breaker.admit(HIGH)
+    assert 1 <= e.value.wait <= circuit_breaker.COOLDOWN
+
+
+def test_old_requests_leave_the_window(clock):
+    breaker = CircuitBreaker()
+    _record(breaker, circuit_breaker.MIN_REQUESTS, latency_ms=3000)
+    clock.advance(circuit_breaker.WINDOW + 1)
+    assert _state(breaker, clock) == CLOSED
+
+
+def test_half_open_admits_a_share_of_high_priority(clock, monkeypatch):
+    breaker = CircuitBreaker()
+    _open(breaker, clock)
+    assert breaker.should_shed()
+    draws = iter([0, circuit_breaker.HALF_OPEN_RATE])
+    monkeypatch.setattr(circuit_breaker.random, 'random', lambda: next(draws))
+    breaker.admit(HIGH)
+    with pytest.raises(Overloaded):
+        breaker.admit(HIGH)
+    with pytest.raises(Overloaded):
+        breaker.admit(LOW)
+
+
+def test_half_open_waits_for_enough_probes(clock, probe_all):
+    breaker = CircuitBreaker()
+    _open(breaker, clock)
+    _record(breaker, circuit_breaker.HALF_OPEN_PROBES - 1)
+    assert _state(breaker, clock) == HALF_OPEN
+    _record(breaker, 1)
+    assert _state(breaker, clock) == CLOSED
+    breaker.admit(LOW)
+
+
+def test_slow_probes_reopen_the_breaker(clock, probe_all):
+    breaker = CircuitBreaker()
+    _open(breaker, clock)
+    _record(breaker, circuit_breaker.HALF_OPEN_PROBES, latency_ms=2500)
+    assert _state(breaker, clock) == OPEN
+
+
+def test_failing_probes_reopen_the_breaker_early(clock, probe_all):
+    breaker = CircuitBreaker()
+    _open(breaker, clock)
+    failures = ceil(
+        circuit_breaker.HALF_OPEN_PROBES * circuit_breaker.ERROR_RATE / 2
+    )
+    _record(breaker, failures - 1, failed=True)
+    assert _state(breaker, clock) == HALF_OPEN
+    _record(breaker, 1, failed=True)
+    assert _state(breaker, clock) == OPEN
+
+
+def test_disabled(clock, monkeypatch):
+    monkeypatch.setattr(settings, 'USE_CIRCUIT_BREAKER', False)
+    breaker = CircuitBreaker()
+    _record(breaker, circuit_breaker.MIN_REQUESTS, failed=True)
+    breaker.admit(HIGH)
+    assert not breaker.should_shed()
+
+
+@pytest.mark.parametrize('status, failed', [
+    (None, False),
+    (400, False),
+    (404, False),
+    (429, True),
+    (503, True),
+    ('N/A', True)
+])
+def test_connection_records_outcome(clock, monkeypatch, status, failed):
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(circuit_breaker, 'breaker', breaker)
+
+    def perform_request(self, *args, **kwargs):
+        clock.advance(0.25)
+        if status is not None:
+            raise TransportError(status)
+        return 200, {}, ''
+    monkeypatch.setattr(
+        RequestsHttpConnection, 'perform_request', perform_request
+    )
+    connection = BreakerConnection.__new__(BreakerConnection)
+    if status is None:
+        connection.perform_request('GET', '/')
+    else:
+        with pytest.raises(TransportError):
+            connection.perform_request('GET', '/')
+    assert [(s[1], s[2]) for s in breaker._samples] == [(250, failed)]
@@ -0,0 +1,126 @@
+import random
+import uuid
+from cccatalog.api.utils import dead_link_mask
+from cccatalog.api.utils.dead_link_mask import get_query_mask, \
+    save_query_mask, mark_dead_link, MASK_BLOCK_BITS
+
+"""
+Unit tests for dead link masks. Requires Redis.
+"""
+
+
+def _query_hash():
+    return f'test-{uuid.uuid4().hex}'
+
+
+def _assert_mask(query_hash, expected):
+    """
+    Check a stored mask against a list of the expected liveness of each
+    result.
+    """
+    mask = get_query_mask(query_hash)
+    assert mask.length == len(expected)
+    alive = [position for position, bit in enumerate(expected) if bit]
+    assert mask.alive == len(alive)
+    for block in range(len(mask.prefix_counts) - 1):
+        before = sum(expected[:block * MASK_BLOCK_BITS])
+        assert mask.prefix_counts[block] == before
+    for rank, position in enumerate(alive, start=1):
+        assert mask.select(rank) == position
+
+
+def _random_mask(length, seed):
+    rng = random.Random(seed)
+    return [1 if rng.random() > 0.3 else 0 for _ in range(length)]
+
+
+def test_missing_mask():
+    assert get_query_mask(_query_hash()) is None
+
+
+def test_save_across_block_boundaries():
+    query_hash = _query_hash()
+    expected = _random_mask(3 * MASK_BLOCK_BITS + 5, seed=1)
+    save_query_mask(query_hash, expected)
+    _assert_mask(query_hash, expected)
+
+
+def test_pages_extend_the_mask():
+    query_hash = _query_hash()
+    expected = _random_mask(2 * MASK_BLOCK_BITS + 40, seed=2)
+    # Page sizes that don't line up with bytes or blocks
+    page = 37
+    for start in range(0, len(expected), page):
+        save_query_mask(query_hash, expected[start:start + page], start=start)
+        _assert_mask(query_hash, expected[:start + page])
+
+
+def test_gap_before_start_is_assumed_alive():
+    query_hash = _query_hash()
+    first = _random_mask(13, seed=3)
+    save_query_mask(query_hash, first)
+    later = _random_mask(20, seed=4)
+    start = MASK_BLOCK_BITS + 3
+    save_query_mask(query_hash, later, start=start)
+    _assert_mask(query_hash, first + [1] * (start - len(first)) + later)
+
+
+def test_save_replaces_from_start():
+    query_hash = _query_hash()
+    original = [1] * (2 * MASK_BLOCK_BITS)
+    save_query_mask(query_hash, original)
+    start = MASK_BLOCK_BITS + 11
+    replacement = [0, 1, 0]
+    save_query_mask(query_hash, replacement, start=start)
+    _assert_mask(query_hash, original[:start] + replacement)
+
+
+def test_stale_bits_after_truncation_are_ignored():
+    query_hash = _query_hash()
+    save_query_mask(query_hash, [1] * 64)
+    save_query_mask(query_hash, [0, 0], start=3)
+    _assert_mask(query_hash, [1, 1, 1, 0, 0])
+    # Extending again overwrites whatever was left behind.
+    save_query_mask(query_hash, [0] * 10, start=5)
+    _assert_mask(query_hash, [1, 1, 1] + [0] * 12)
+
+
+def test_mark_dead_link():
+    query_hash = _query_hash()
+    expected = [1] * (2 * MASK_BLOCK_BITS + 1)
+    save_query_mask(query_hash, expected)
+    for position in (0, MASK_BLOCK_BITS - 1, MASK_BLOCK_BITS + 7):
+        mark_dead_link(query_hash, position)
+        expected[position] = 0
+        _assert_mask(query_hash, expected)
+    # Already dead, or past the end of the mask
+    mark_dead_link(query_hash, 0)
+    mark_dead_link(query_hash, len(expected))
+    _assert_mask(query_hash, expected)
+
+
+def test_mark_dead_link_without_mask():
+    query_hash = _query_hash()
+    mark_dead_link(query_hash, 3)
+    assert get_query_mask(query_hash) is None
+
+
+def test_save_retries_when_mask_changes(monkeypatch):
+    query_hash = _query_hash()
+    expected = [1] * 20
+    save_query_mask(query_hash, expected)
+    parse_index = dead_link_mask._parse_index
+    interfered = []
+
+    def interfering_parse_index(index):
+        # Another worker marks a dead link while the mask is being saved.
+        if not interfered:
+            interfered.append(True)
+            mark_dead_link(query_hash, 3)
+        return parse_index(index)
+    monkeypatch.setattr(
+        dead_link_mask, '_parse_index', interfering_parse_index
+    )
+    save_query_mask(query_hash, [0] * 5, start=20)
+    expected[3] = 0
+    _assert_mask(query_hash, expected + [0] * 5)
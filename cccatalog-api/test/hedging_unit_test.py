@@ -0,0 +1,104 @@
+import threading
+import time
+import pytest
+from cccatalog import settings
+from cccatalog.api.utils import hedging
+from cccatalog.api.utils.circuit_breaker import breaker
+
+"""
+Unit tests for hedged Elasticsearch requests. The breaker's rolling p95 is
+fixed at 50ms so that slow attempts are hedged deterministically.
+"""
+
+SLOW = 0.5
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(settings, 'USE_HEDGED_REQUESTS', True, raising=False)
+    monkeypatch.setattr(settings, 'HEDGE_RATE', 0.05, raising=False)
+    monkeypatch.setattr(breaker, 'percentile', lambda *args, **kwargs: 50)
+    monkeypatch.setattr(breaker, 'should_shed', lambda: False)
+    budget = hedging._TokenBucket(hedging.MAX_HEDGE_TOKENS)
+    monkeypatch.setattr(hedging, '_budget', budget)
+    return budget
+
+
+def _recording(answer):
+    calls = []
+
+    def execute(preference):
+        calls.append((preference, threading.current_thread()))
+        return answer(preference)
+    return execute, calls
+
+
+def test_disabled_runs_inline(monkeypatch):
+    monkeypatch.setattr(settings, 'USE_HEDGED_REQUESTS', False, raising=False)
+    execute, calls = _recording(lambda preference: 'primary')
+    assert hedging.hedged(execute, 'bucket-1') == 'primary'
+    assert calls == [('bucket-1', threading.current_thread())]
+
+
+def test_fast_search_is_not_hedged(enabled):
+    execute, calls = _recording(lambda preference: 'primary')
+    assert hedging.hedged(execute, 'bucket-1') == 'primary'
+    time.sleep(0.1)
+    assert [preference for preference, _ in calls] == ['bucket-1']
+    # The token set aside for the hedge was given back.
+    assert enabled._tokens == hedging.MAX_HEDGE_TOKENS
+
+
+def test_slow_search_is_hedged_without_preference(enabled):
+    def answer(preference):
+        if preference is not None:
+            time.sleep(SLOW)
+            return 'primary'
+        return 'hedge'
+    execute, calls = _recording(answer)
+    start = time.monotonic()
+    assert hedging.hedged(execute, 'bucket-1') == 'hedge'
+    assert time.monotonic() - start < SLOW
+    assert [preference for preference, _ in calls] == ['bucket-1', None]
+
+
+def test_no_thread_without_budget(enabled):
+    enabled._tokens = 0
+    execute, calls = _recording(lambda preference: 'primary')
+    assert hedging.hedged(execute, 'bucket-1') == 'primary'
+    assert calls == [('bucket-1', threading.current_thread())]
+
+
+def test_budget_caps_hedges(enabled):
+    enabled._tokens = 1
+
+    def answer(preference):
+        if preference is not None:
+            time.sleep(0.1)
+        return preference
+    execute, calls = _recording(answer)
+    for _ in range(5):
+        hedging.hedged(execute, 'bucket-1')
+    hedges = [preference for preference, _ in calls if preference is None]
+    # One token, plus 0.05 for each search, allows a single hedge.
+    assert len(hedges) == 1
+
+
+def test_failed_attempt_waits_for_the_other(enabled):
+    def answer(preference):
+        if preference is None:
+            raise RuntimeError('hedge failed')
+        time.sleep(0.2)
+        return 'primary'
+    execute, _ = _recording(answer)
+    assert hedging.hedged(execute, 'bucket-1') == 'primary'
+
+
+def test_both_attempts_failing_raises(enabled):
+    def answer(preference):
+        if preference is not None:
+            time.sleep(0.2)
+        raise RuntimeError(preference)
+    execute, _ = _recording(answer)
+    with pytest.raises(RuntimeError):
+        hedging.hedged(execute, 'bucket-1')
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from cccatalog import settings
+from cccatalog.api.utils import preference
+from cccatalog.api.utils.preference import get_preference, \
+    get_request_preference
+
+"""
+Unit tests for choosing the Elasticsearch preference of a search.
+"""
+
+IDENTITIES = [f'ip:10.0.{i // 256}.{i % 256}' for i in range(2000)]
+
+
+def _buckets(num_buckets):
+    return [
+        preference._jump_hash(preference._digest(identity), num_buckets)
+        for identity in IDENTITIES
+    ]
+
+
+def test_jump_hash_covers_every_bucket():
+    buckets = _buckets(10)
+    assert set(buckets) == set(range(10))
+
+
+def test_adding_a_bucket_moves_few_identities():
+    before = _buckets(10)
+    after = _buckets(11)
+    moved = [(b, a) for b, a in zip(before, after) if b != a]
+    # Identities only ever move to the new bucket.
+    assert all(a == 10 for _, a in moved)
+    # About 1 / 11 of them do.
+    assert len(moved) < len(IDENTITIES) / 11 * 1.5
+
+
+def test_preference_is_deterministic(monkeypatch):
+    monkeypatch.setattr(settings, 'SEARCH_PREFERENCE_BUCKETS', 32)
+    chosen = get_preference('ip:10.0.0.1')
+    assert chosen == get_preference('ip:10.0.0.1')
+    assert chosen.startswith('bucket-')
+    assert 0 <= int(chosen[len('bucket-'):]) < 32
+
+
+def test_preference_without_buckets(monkeypatch):
+    monkeypatch.setattr(settings, 'SEARCH_PREFERENCE_BUCKETS', 0)
+    chosen = get_preference('ip:10.0.0.1')
+    assert len(chosen) == 16
+    int(chosen, 16)
+    assert chosen != get_preference('ip:10.0.0.2')
+
+
+def test_request_preference(monkeypatch):
+    monkeypatch.setattr(settings, 'SEARCH_PREFERENCE_BUCKETS', 0)
+    anonymous = SimpleNamespace(auth=None)
+    assert get_request_preference(anonymous, '10.0.0.1') == \
+        get_preference('ip:10.0.0.1')
+    application = SimpleNamespace(client_id='client')
+    authenticated = SimpleNamespace(
+        auth=SimpleNamespace(application=application)
+    )
+    assert get_request_preference(authenticated, '10.0.0.1') == \
+        get_preference('client:client')
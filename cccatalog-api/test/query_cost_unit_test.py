@@ -0,0 +1,78 @@
+import pytest
+from cccatalog.api.utils import query_cost
+from cccatalog.api.utils.query_cost import strip_negations, limit_cost, \
+    ACCEPTED, REWRITTEN, REJECTED
+
+"""
+Unit tests for the local `simple_query_string` analysis.
+"""
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('dog', 'dog'),
+    ('dog -cat', 'dog'),
+    ('+dog -cat~2', '+dog'),
+    ('dog -"red cat" fish', 'dog  fish'),
+    ('-(a b) c', 'c'),
+    ('t-shirt -(x (y) z) w', 't-shirt  w'),
+    ('"red dog" | cat*', '"red dog" | cat*'),
+    ('-cat', '')
+])
+def test_strip_negations(query, expected):
+    assert strip_negations(query) == expected
+
+
+@pytest.mark.parametrize('query, kinds', [
+    ('dog', ['word']),
+    ('ne*', ['prefix']),
+    ('ne\\*', ['word']),
+    ('dog~', ['fuzzy']),
+    ('fi*~1', ['fuzzy']),
+    ('"red dog"~5', ['phrase']),
+    ('+dog (cat)', ['operator', 'word', 'operator', 'operator', 'word',
+                    'operator'])
+])
+def test_parse(query, kinds):
+    terms = query_cost.parse(query)
+    assert [t.kind for t in terms] == kinds
+    assert ''.join(t.raw for t in terms) == query
+
+
+@pytest.mark.parametrize('query, prefix_indexed, expected', [
+    ('dog cat', False, 2 * query_cost.TERM_COST),
+    ('news*', False, query_cost.PREFIX_COST),
+    ('ne*', False, query_cost.SHORT_PREFIX_COST),
+    ('ne*', True, query_cost.TERM_COST),
+    ('dog~', False, query_cost.FUZZY_COST * query_cost.DEFAULT_FUZZINESS),
+    ('dog~0', False, query_cost.FUZZY_COST),
+    ('"red dog"~3', False,
+     2 * query_cost.PHRASE_TERM_COST + 3 * query_cost.PHRASE_SLOP_COST)
+])
+def test_query_cost(query, prefix_indexed, expected):
+    terms = query_cost.parse(query)
+    assert query_cost.query_cost(terms, prefix_indexed) == expected
+
+
+@pytest.mark.parametrize('query, budget, expected, decision', [
+    ('dog~2 cat', 50, 'dog~2 cat', ACCEPTED),
+    ('*', 50, '*', ACCEPTED),
+    ('dog~2 "red cat"~4', 10, 'dog "red cat"', REWRITTEN),
+    ('a* dog', 10, 'a dog', REWRITTEN),
+    # Dropping fuzziness leaves a short prefix, which is dropped as well.
+    ('fi*~2 dog', 10, 'fi dog', REWRITTEN),
+    ('fish*~2 dog', 10, 'fish* dog', REWRITTEN),
+    ('a b c d', 2, 'a b', REWRITTEN),
+    ('"a b c"~9', 5, '"a b c"~9', REJECTED)
+])
+def test_limit_cost(query, budget, expected, decision):
+    limited, cost, actual = limit_cost(query, budget)
+    assert (limited, actual) == (expected, decision)
+    assert cost == query_cost.query_cost(query_cost.parse(query))
+
+
+def test_render_decision_counts():
+    rendered = query_cost.render_decision_counts({ACCEPTED: 3, REJECTED: 0})
+    assert rendered.endswith(
+        f'{query_cost.METRIC_NAME}{{decision="accepted"}} 3\n'
+        f'{query_cost.METRIC_NAME}{{decision="rejected"}} 0\n'
+    )
@@ -0,0 +1,61 @@
+from elasticsearch_dsl import Search
+from cccatalog.api.utils.query_fingerprint import get_query_fingerprint
+
+"""
+Unit tests for query fingerprints.
+"""
+
+
+def _search(query='dog', licenses=('by', 'cc0'), providers=('flickr',)):
+    s = Search()
+    s = s.query('simple_query_string', query=query, fields=['title'])
+    s = s.filter('terms', license=list(licenses))
+    s = s.filter('terms', provider=list(providers))
+    return s
+
+
+def test_fingerprint_is_deterministic():
+    fingerprint = get_query_fingerprint(_search())
+    assert fingerprint == get_query_fingerprint(_search())
+    assert len(fingerprint) == 32
+    int(fingerprint, 16)
+
+
+def test_filter_order_is_ignored():
+    s = Search().query('simple_query_string', query='dog', fields=['title'])
+    license_first = s.filter('terms', license=['by']) \
+        .filter('terms', provider=['flickr'])
+    provider_first = s.filter('terms', provider=['flickr']) \
+        .filter('terms', license=['by'])
+    assert get_query_fingerprint(license_first) == \
+        get_query_fingerprint(provider_first)
+
+
+def test_terms_order_is_ignored():
+    assert get_query_fingerprint(_search(licenses=['by', 'cc0'])) == \
+        get_query_fingerprint(_search(licenses=['cc0', 'by']))
+
+
+def test_query_case_and_spacing_are_ignored():
+    assert get_query_fingerprint(_search(query='Red  dog ')) == \
+        get_query_fingerprint(_search(query='red dog'))
+
+
+def test_pagination_is_ignored():
+    s = _search()
+    assert get_query_fingerprint(s[0:20]) == get_query_fingerprint(s[20:40])
+
+
+def test_different_searches_differ():
+    fingerprint = get_query_fingerprint(_search())
+    assert fingerprint != get_query_fingerprint(_search(query='cat'))
+    assert fingerprint != get_query_fingerprint(_search(licenses=['by']))
+    assert fingerprint != get_query_fingerprint(_search(), index='image')
+
+
+def test_context_is_part_of_the_fingerprint():
+    s = _search()
+    assert get_query_fingerprint(s, index='image', page_size=20) == \
+        get_query_fingerprint(s, page_size=20, index='image')
+    assert get_query_fingerprint(s, index='image', page_size=20) != \
+        get_query_fingerprint(s, index='image', page_size=40)
@@ -0,0 +1,151 @@
+import threading
+import time
+import uuid
+import pytest
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from cccatalog.api.utils import singleflight
+
+"""
+Unit tests for coalescing concurrent searches. Requires Redis.
+"""
+
+
+def _key():
+    return f'test-{uuid.uuid4().hex}'
+
+
+def _identity(value):
+    return value
+
+
+def _hold_lease(key, timeout=singleflight.LEASE_TTL):
+    """ Take the lease for a key as another process would. """
+    redis = get_redis_connection('default')
+    lease = redis.lock(singleflight.LEASE_PREFIX + key, timeout=timeout)
+    assert lease.acquire(blocking=False)
+    return lease
+
+
+def _in_thread(fn):
+    outcome = {}
+
+    def run():
+        outcome['result'] = fn()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def test_concurrent_callers_compute_once():
+    key = _key()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'result'
+    threads = [
+        _in_thread(lambda: singleflight.do(key, compute, _identity, _identity))
+        for _ in range(5)
+    ]
+    for thread, _ in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(outcome['result'] == 'result' for _, outcome in threads)
+
+
+def test_leader_error_is_shared_in_process():
+    key = _key()
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError('failed')
+    errors = []
+
+    def call():
+        try:
+            singleflight.do(key, compute)
+        except RuntimeError as e:
+            errors.append(e)
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+
+
+def test_result_is_handed_off_across_processes():
+    key = _key()
+    lease = _hold_lease(key)
+    thread, outcome = _in_thread(
+        lambda: singleflight.do(key, lambda: 'computed', _identity, _identity)
+    )
+    time.sleep(0.2)
+    cache.set(
+        singleflight.RESULT_PREFIX + key,
+        (lease.local.token, 'handed off'),
+        timeout=singleflight.LEASE_TTL
+    )
+    lease.release()
+    thread.join()
+    assert outcome['result'] == 'handed off'
+
+
+def test_result_of_previous_lease_is_not_reused():
+    key = _key()
+    cache.set(
+        singleflight.RESULT_PREFIX + key,
+        (b'previous lease', 'stale'),
+        timeout=singleflight.LEASE_TTL
+    )
+    result = singleflight.do(key, lambda: 'fresh', _identity, _identity)
+    assert result == 'fresh'
+
+
+def test_result_of_other_lease_is_ignored_while_waiting():
+    key = _key()
+    lease = _hold_lease(key)
+    cache.set(
+        singleflight.RESULT_PREFIX + key,
+        (b'another lease', 'stale'),
+        timeout=singleflight.LEASE_TTL
+    )
+    thread, outcome = _in_thread(
+        lambda: singleflight.do(key, lambda: 'fresh', _identity, _identity)
+    )
+    time.sleep(0.2)
+    lease.release()
+    thread.join()
+    assert outcome['result'] == 'fresh'
+
+
+def test_waiters_compute_when_lease_expires():
+    key = _key()
+    _hold_lease(key, timeout=0.5)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'computed'
+    start = time.time()
+    assert singleflight.do(key, compute, _identity, _identity) == 'computed'
+    assert calls == [1]
+    assert time.time() - start < singleflight.LEASE_TTL
+
+
+def test_without_encoding_work_is_not_shared_across_processes():
+    key = _key()
+    _hold_lease(key)
+    assert singleflight.do(key, lambda: 'computed') == 'computed'
+
+
+@pytest.fixture(autouse=True)
+def _no_leftover_calls():
+    yield
+    assert not singleflight._calls
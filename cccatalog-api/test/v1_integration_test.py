@@ -1,3 +1,4 @@
+import re
 import requests
 import json
 import pytest
@@ -82,6 +83,154 @@ def test_search_consistency():
             images.add(image_id)
 
 
+def test_search_result_fields(search_fixture):
+    """
+    Search results only fetch part of each document from Elasticsearch; make
+    sure that's still enough to serialize them.
+    """
+    result = search_fixture['results'][0]
+    for field in ['id', 'url', 'thumbnail', 'source', 'license',
+                  'license_version', 'license_url', 'foreign_landing_url',
+                  'detail_url', 'related_url']:
+        assert result.get(field) is not None, field
+
+
+def test_fields_matched(search_fixture):
+    result = search_fixture['results'][0]
+    assert result['fields_matched']
+    assert 'highlight' not in result
+
+
+def test_fields_matched_ignores_negated_terms():
+    response = requests.get(
+        API_URL + '/v1/images', params={'q': 'dog -cat'}, verify=False
+    )
+    assert response.status_code == 200
+    for result in json.loads(response.text)['results']:
+        # Only fields containing "dog" match, not every field lacking "cat".
+        assert result['fields_matched']
+        for field in result['fields_matched']:
+            text = json.dumps(result.get(field.split('.')[0], '')).lower()
+            assert field == 'description' or 'dog' in text
+
+
+def test_highlight():
+    response = requests.get(
+        API_URL + '/v1/images?q=dog&highlight=true', verify=False
+    )
+    assert response.status_code == 200
+    result = json.loads(response.text)['results'][0]
+    assert set(result['highlight']) <= set(result['fields_matched'])
+
+
+def test_prefix_search():
+    response = requests.get(API_URL + '/v1/images?q=do*', verify=False)
+    assert response.status_code == 200
+    results = json.loads(response.text)['results']
+    assert results
+    for result in results:
+        assert result['fields_matched']
+
+
+def test_prefix_search_without_prefix_index():
+    response = requests.get(API_URL + '/v1/images?q=dog', verify=False)
+    creator = json.loads(response.text)['results'][0]['creator']
+    prefix = re.match(r'\w+', creator).group(0)[:3]
+    response = requests.get(
+        API_URL + f'/v1/images?creator={prefix}*', verify=False
+    )
+    assert response.status_code == 200
+    assert json.loads(response.text)['results']
+
+
+def test_facets():
+    response = requests.get(API_URL + '/v1/images/facets?q=dog', verify=False)
+    assert response.status_code == 200
+    facets = json.loads(response.text)['facets']
+    assert {'license', 'license_type', 'source', 'extension', 'categories',
+            'aspect_ratio', 'size'} <= set(facets)
+    assert facets['license']
+
+
+def test_facets_ignore_own_filter():
+    unfiltered = requests.get(
+        API_URL + '/v1/images/facets?q=dog', verify=False
+    )
+    filtered = requests.get(
+        API_URL + '/v1/images/facets?q=dog&license=cc0', verify=False
+    )
+    unfiltered = json.loads(unfiltered.text)['facets']
+    filtered = json.loads(filtered.text)['facets']
+    assert filtered['license'] == unfiltered['license']
+
+
+def test_batch_search():
+    queries = [{'q': 'dog', 'license': 'by'}, {'q': 'cat', 'page_size': 5}]
+    response = requests.post(
+        API_URL + '/v1/images/batch_search', json={'queries': queries},
+        verify=False
+    )
+    assert response.status_code == 200
+    batch_results = json.loads(response.text)['results']
+    assert len(batch_results) == 2
+    single = requests.get(
+        API_URL + '/v1/images?q=dog&license=by', verify=False
+    )
+    single_ids = [r['id'] for r in json.loads(single.text)['results']]
+    assert [r['id'] for r in batch_results[0]['results']] == single_ids
+    assert batch_results[1]['page_size'] <= 5
+
+
+def test_batch_search_invalid_query():
+    queries = [{'q': 'dog'}, {'q': 'dog', 'page_size': 'many'}]
+    response = requests.post(
+        API_URL + '/v1/images/batch_search', json={'queries': queries},
+        verify=False
+    )
+    assert response.status_code == 400
+    assert 'queries[1].page_size' in json.loads(response.text)['fields']
+
+
+def test_exact_result_count():
+    bounded = requests.get(API_URL + '/v1/images?q=dog', verify=False)
+    exact = requests.get(
+        API_URL + '/v1/images?q=dog&exact_count=true', verify=False
+    )
+    assert bounded.status_code == 200 and exact.status_code == 200
+    bounded, exact = json.loads(bounded.text), json.loads(exact.text)
+    assert not exact['result_count_lower_bound']
+    assert exact['result_count'] >= bounded['result_count']
+
+
+def test_server_timing():
+    response = requests.get(API_URL + '/v1/images?q=dog', verify=False)
+    stages = [
+        timing.split(';')[0].strip()
+        for timing in response.headers['Server-Timing'].split(',')
+    ]
+    assert 'total' in stages
+    metrics = requests.get(API_URL + '/metrics/search_timing', verify=False)
+    assert 'cccatalog_stage_duration_ms_count{stage="total"}' in metrics.text
+
+
+def test_search_cache_metrics():
+    for _ in range(2):
+        requests.get(API_URL + '/v1/images?q=cat', verify=False)
+    metrics = requests.get(API_URL + '/metrics/search_cache', verify=False)
+    assert 'cccatalog_search_cache_lookups_total{result="hit"}' in \
+        metrics.text
+
+
+def test_query_cost_rewrite():
+    expensive = 'do* ca* be* ro* fi*~2 "red dog"~9'
+    response = requests.get(
+        API_URL + '/v1/images', params={'q': expensive}, verify=False
+    )
+    assert response.status_code == 200
+    metrics = requests.get(API_URL + '/metrics/query_cost', verify=False)
+    assert 'decision="rewritten"' in metrics.text
+
+
 def test_image_detail(search_fixture):
     test_id = search_fixture['results'][0]['id']
     response = requests.get(API_URL + '/v1/images/{}'.format(test_id), verify=False)
@@ -508,6 +657,42 @@ def test_page_consistency_removing_dead_links(search_without_dead_links):
     assert no_duplicates(ids)
 
 
+def test_cursor_pagination_consistency(search_without_dead_links):
+    """
+    Walking results with `next_cursor` should never repeat a result.
+    """
+    page_results = []
+    cursor = 'start'
+    for _ in range(5):
+        page_data = search_without_dead_links(
+            q='*', page_size=20, cursor=cursor
+        )
+        page_results += page_data['results']
+        cursor = page_data['next_cursor']
+        if not cursor:
+            break
+
+    ids = [result['id'] for result in page_results]
+    assert len(ids) == len(set(ids))
+
+
+def test_deferred_validation(search_without_dead_links):
+    data = search_without_dead_links(
+        q='*', page_size=20, defer_validation=True
+    )
+    assert len(data['results']) > 0
+    metrics = requests.get(API_URL + '/metrics/validation', verify=False)
+    assert 'cccatalog_validation_queue_depth ' in metrics.text
+
+
+def test_invalid_cursor():
+    response = requests.get(
+        API_URL + '/v1/images', params={'q': 'dog', 'cursor': 'garbage'},
+        verify=False
+    )
+    assert response.status_code == 400
+
+
 @pytest.fixture
 def recommendation_factory():
     """
@@ -124,7 +124,13 @@ def index_settings(table_name):
                                         "ignore_above": 256
                                     }
                                 },
-                                "analyzer": "custom_english"
+                                "analyzer": "custom_english",
+                                # Serve trailing wildcard queries (`net*`)
+                                # from a prefix index.
+                                "index_prefixes": {
+                                    "min_chars": 1,
+                                    "max_chars": 10
+                                }
                             }
                         }
                     },
@@ -140,6 +146,11 @@ def index_settings(table_name):
                     "id": {
                         "type": "long"
                     },
+                    "related": {
+                        "type": "keyword",
+                        "index": False,
+                        "doc_values": False
+                    },
                     "identifier": {
                         "fields": {
                             "keyword": {
@@ -158,7 +169,14 @@ def index_settings(table_name):
                                 "ignore_above": 256
                             }
                         },
-                        "analyzer": "custom_english"
+                        "analyzer": "custom_english",
+                        "index_prefixes": {
+                            "min_chars": 1,
+                            "max_chars": 10
+                        },
+                        # Index two-word shingles so that the exact title
+                        # match boost is a term lookup, not a phrase query.
+                        "index_phrases": True
                     },
                     "creator": {
                         "type": "text",
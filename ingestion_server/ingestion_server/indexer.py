@@ -20,6 +20,8 @@ from ingestion_server.elasticsearch_models import \
 from ingestion_server.es_mapping import index_settings
 from ingestion_server.distributed_reindex_scheduler import \
     schedule_distributed_index
+from ingestion_server.related import precompute_related
+from ingestion_server.warmup import warm_index
 from collections import deque
 
 """
@@ -341,6 +343,16 @@ class TableIndexer:
         indices = set(es.indices.get('*'))
         # Re-enable replicas and refresh.
         es.indices.refresh(index=write_index)
+        # Store related images for popular images before the replicas are
+        # created so the updates only have to be written once. Don't hold up
+        # the new index if it fails; the API falls back to live queries.
+        try:
+            conn = database_connect()
+            precompute_related(es, conn, write_index)
+            conn.close()
+        except Exception as e:
+            log.exception(e)
+            log.error('Failed to precompute related images.')
         es.indices.put_settings(
             index=write_index,
             body={
@@ -361,6 +373,15 @@ class TableIndexer:
                 wait_for_status='green',
                 timeout="12h"
             )
+        # Replay popular searches once the replicas are up so that the new
+        # index doesn't serve its first real searches from cold caches.
+        try:
+            conn = database_connect()
+            warm_index(es, conn, write_index)
+            conn.close()
+        except Exception as e:
+            log.exception(e)
+            log.error('Failed to warm up the new index.')
         # If the index exists already and it's not an alias, delete it.
         if live_alias in indices:
             log.warning('Live index already exists. Deleting and realiasing.')
@@ -0,0 +1,142 @@
+import os
+import time
+import logging as log
+import psycopg2
+from elasticsearch import helpers
+from elasticsearch_dsl import Search
+
+"""
+Precompute related images for the most popular images in a new index.
+
+`more_like_this` is one of the most expensive queries served by the API. The
+images people look at most often are a small fraction of the catalog, so
+after each reindex we run the query once for each of them and store the
+ordered identifiers of the results in the `related` field of the image's
+document. The API serves recommendations from that field and falls back to
+a live query for every other image.
+"""
+
+# How many of the most clicked images get a precomputed list. 0 disables.
+RELATED_TOP_N = int(os.environ.get('RELATED_TOP_N', 10000))
+# How far back to count result clicks.
+RELATED_WINDOW_DAYS = int(os.environ.get('RELATED_WINDOW_DAYS', 30))
+# Longer than a page of recommendations so that the API still has enough
+# results after dead links have been filtered out.
+RELATED_LIST_SIZE = 40
+# Number of `more_like_this` queries sent to Elasticsearch at once.
+MSEARCH_BATCH_SIZE = 50
+
+
+def get_popular_identifiers(conn, limit):
+    """
+    Find the identifiers of the most clicked images in the analytics tables.
+
+    :param conn: A connection to the API database.
+    :param limit: The maximum number of identifiers to return.
+    :return: A list of identifiers, most clicked first.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            '''
+            SELECT result_uuid FROM result_clicked_event
+            WHERE timestamp > now() - %s * interval '1 day'
+            GROUP BY result_uuid
+            ORDER BY count(*) DESC
+            LIMIT %s
+            ''',
+            (RELATED_WINDOW_DAYS, limit)
+        )
+        identifiers = [str(row[0]) for row in cur.fetchall()]
+    except psycopg2.ProgrammingError:
+        log.warning('No click events found; skipping related images.')
+        conn.rollback()
+        identifiers = []
+    cur.close()
+    return identifiers
+
+
+def related_query(index, doc_id):
+    """
+    The recommendations query run by the API for a single image.
+    """
+    s = Search(index=index)
+    s = s.query(
+        'more_like_this',
+        fields=['tags.name', 'title', 'creator'],
+        like={
+            '_index': index,
+            '_id': doc_id
+        },
+        min_term_freq=1,
+        max_query_terms=50
+    )
+    s = s.exclude('term', mature=True)
+    s = s.source(['identifier'])
+    return s[0:RELATED_LIST_SIZE]
+
+
+def related_update_actions(index, doc_ids, responses):
+    """
+    Turn the responses to a batch of related image queries into bulk
+    updates setting the `related` field of each image.
+
+    :param index: The index being updated.
+    :param doc_ids: The document ID of each image, in query order.
+    :param responses: The raw `msearch` response for each query.
+    :return: A list of bulk update actions.
+    """
+    actions = []
+    for doc_id, response in zip(doc_ids, responses):
+        if 'error' in response:
+            log.warning(f'Related image query for {doc_id} failed')
+            continue
+        related = [
+            hit['_source']['identifier'] for hit in response['hits']['hits']
+        ]
+        actions.append({
+            '_op_type': 'update',
+            '_index': index,
+            '_id': doc_id,
+            'doc': {'related': related}
+        })
+    return actions
+
+
+def _get_doc_ids(es, index, identifiers):
+    s = Search(using=es, index=index)
+    s = s.filter('terms', **{'identifier.keyword': identifiers})
+    s = s.source(False)[0:len(identifiers)]
+    return [hit.meta.id for hit in s.execute()]
+
+
+def precompute_related(es, conn, index, top_n=RELATED_TOP_N):
+    """
+    Store related image lists for the `top_n` most clicked images in `index`.
+
+    :param es: An Elasticsearch connection.
+    :param conn: A connection to the API database.
+    :param index: The (not yet live) index to update.
+    :param top_n: How many images get a precomputed list.
+    """
+    if not top_n:
+        return
+    start_time = time.time()
+    identifiers = get_popular_identifiers(conn, top_n)
+    updated = 0
+    for start in range(0, len(identifiers), MSEARCH_BATCH_SIZE):
+        batch = identifiers[start:start + MSEARCH_BATCH_SIZE]
+        doc_ids = _get_doc_ids(es, index, batch)
+        if not doc_ids:
+            continue
+        body = []
+        for doc_id in doc_ids:
+            body += [{'index': index}, related_query(index, doc_id).to_dict()]
+        responses = es.msearch(body=body)['responses']
+        actions = related_update_actions(index, doc_ids, responses)
+        updated += helpers.bulk(es, actions, raise_on_error=False)[0]
+    es.indices.refresh(index=index)
+    log.info(
+        f'Precomputed related images for {updated} images in {index} in '
+        f'{time.time() - start_time:.1f}s'
+    )
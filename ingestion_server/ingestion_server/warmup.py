@@ -0,0 +1,112 @@
+import os
+import time
+import logging as log
+import psycopg2
+from elasticsearch_dsl import Search
+
+"""
+Warm Elasticsearch's caches for a new index before it is promoted.
+
+Right after an alias is flipped, the filter caches, the request cache and the
+operating system's page cache are empty for the new index, and the first
+searches against it are much slower than usual. We replay the most frequent
+searches recorded by the analytics server against the new index before
+promotion. The API's cache warmer replays them again through the API once the
+alias has been flipped, which fills its search cache.
+"""
+
+# How many of the most frequent searches are replayed. 0 disables.
+WARMUP_SEARCHES = int(os.environ.get('WARMUP_SEARCHES', 100))
+# How far back to count searches.
+WARMUP_WINDOW_DAYS = int(os.environ.get('WARMUP_WINDOW_DAYS', 7))
+# How many searches Elasticsearch runs at once.
+WARMUP_CONCURRENCY = int(os.environ.get('WARMUP_CONCURRENCY', 4))
+# The API's default page size.
+WARMUP_PAGE_SIZE = 20
+SEARCH_FIELDS = ['tags.name', 'title', 'description']
+
+
+def get_top_searches(conn, limit):
+    """
+    Find the most frequent search terms in the analytics tables. The daily
+    `top_searches` reports are used if there are any; otherwise the raw
+    search events are counted.
+
+    :param conn: A connection to the API database.
+    :param limit: The maximum number of terms to return.
+    :return: A list of search terms, most frequent first.
+    """
+    queries = [
+        '''
+        SELECT term FROM top_searches
+        WHERE end_time > now() - %s * interval '1 day'
+        GROUP BY term
+        ORDER BY sum(hits) DESC
+        LIMIT %s
+        ''',
+        '''
+        SELECT query FROM search_event
+        WHERE timestamp > now() - %s * interval '1 day'
+        GROUP BY query
+        ORDER BY count(*) DESC
+        LIMIT %s
+        '''
+    ]
+    for query in queries:
+        cur = conn.cursor()
+        try:
+            cur.execute(query, (WARMUP_WINDOW_DAYS, limit))
+            terms = [row[0] for row in cur.fetchall() if row[0]]
+        except psycopg2.ProgrammingError:
+            conn.rollback()
+            terms = []
+        cur.close()
+        if terms:
+            return terms
+    log.warning('No search events found; skipping cache warm-up.')
+    return []
+
+
+def warmup_query(index, term):
+    """
+    A search shaped like the API's default search for `term`: the same
+    fields, the same filter on mature content and the first page of results.
+    """
+    s = Search(index=index)
+    s = s.query(
+        'simple_query_string',
+        query=term,
+        fields=SEARCH_FIELDS,
+        default_operator='AND'
+    )
+    s = s.exclude('term', mature=True)
+    return s[0:WARMUP_PAGE_SIZE]
+
+
+def warm_index(es, conn, index, limit=WARMUP_SEARCHES):
+    """
+    Replay the most frequent searches against `index`, at most
+    WARMUP_CONCURRENCY at a time.
+
+    :param es: An Elasticsearch connection.
+    :param conn: A connection to the API database.
+    :param index: The (not yet live) index to warm.
+    :param limit: How many searches to replay.
+    """
+    if not limit:
+        return
+    start_time = time.time()
+    terms = get_top_searches(conn, limit)
+    if not terms:
+        return
+    body = []
+    for term in terms:
+        body += [{'index': index}, warmup_query(index, term).to_dict()]
+    responses = es.msearch(
+        body=body, max_concurrent_searches=WARMUP_CONCURRENCY
+    )['responses']
+    failed = sum(1 for response in responses if 'error' in response)
+    log.info(
+        f'Replayed {len(terms) - failed} searches against {index} in '
+        f'{time.time() - start_time:.1f}s'
+    )
@@ -1,9 +1,12 @@
+import json
 import pytest
 import datetime
 from uuid import uuid4
 from psycopg2.extras import Json
 from ingestion_server.cleanup import CleanupFunctions
 from ingestion_server.elasticsearch_models import Image
+from ingestion_server.related import related_update_actions
+from ingestion_server.warmup import warmup_query
 
 
 def create_mock_image(override=None):
@@ -185,3 +188,36 @@ class TestCleanup:
         assert img.standardized_popularity == 100
         img2 = create_mock_image({'standardized_popularity': 0})
         assert img2.standardized_popularity is None
+
+
+class TestRelated:
+    @staticmethod
+    def test_related_update_actions():
+        responses = [
+            {'hits': {'hits': [
+                {'_source': {'identifier': 'b'}},
+                {'_source': {'identifier': 'c'}}
+            ]}},
+            {'error': {'type': 'search_phase_execution_exception'}}
+        ]
+        actions = related_update_actions('image-1', ['1', '2'], responses)
+        assert actions == [{
+            '_op_type': 'update',
+            '_index': 'image-1',
+            '_id': '1',
+            'doc': {'related': ['b', 'c']}
+        }]
+
+
+class TestWarmup:
+    @staticmethod
+    def test_warmup_query():
+        query = warmup_query('image-1', 'dog').to_dict()
+        assert query['size'] == 20
+        serialized = json.dumps(query)
+        assert json.dumps({
+            'query': 'dog',
+            'fields': ['tags.name', 'title', 'description'],
+            'default_operator': 'AND'
+        }) in serialized
+        assert json.dumps({'term': {'mature': True}}) in serialized